@@ -3,7 +3,6 @@ import random
 import math
 import warnings
 from sys import maxsize
-import json
 
 
 """
@@ -15,8 +14,8 @@ Advanced strategy tips:
   - You can analyze action frames by modifying on_action_frame function
 
   - The GameState.map object can be manually manipulated to create hypothetical 
-  board states. Though, we recommended making a copy of the map to preserve 
-  the actual current map state.
+  board states. Though, we recommended working on game_state.fork(), a cheap 
+  copy-on-write copy, to preserve the actual current map state.
 """
 
 class AlgoStrategy(gamelib.AlgoCore):
@@ -43,6 +42,8 @@ class AlgoStrategy(gamelib.AlgoCore):
         SP = 0
         # This is a good place to do initial setup
         self.scored_on_locations = []
+        # To score candidate turns on every CPU core, start a pool of worker processes here with
+        # self.start_rollout_pool(), then call self.rollout_pool.evaluate(game_state, candidates) in on_turn
 
     def on_turn(self, turn_state):
         """
@@ -52,7 +53,8 @@ class AlgoStrategy(gamelib.AlgoCore):
         unit deployments, and transmitting your intended deployments to the
         game engine.
         """
-        game_state = gamelib.GameState(self.config, turn_state)
+        # lazy=True only creates the units at a location when the strategy first looks at it
+        game_state = gamelib.GameState(self.config, turn_state, lazy=True)
         gamelib.debug_write('Performing turn {} of your custom algo strategy'.format(game_state.turn_number))
         game_state.suppress_warnings(True)  #Comment or remove this line to enable warnings.
 
@@ -183,13 +185,14 @@ class AlgoStrategy(gamelib.AlgoCore):
         estimate the path's damage risk.
         """
         damages = []
-        # Get the damage estimate each path will take
-        for location in location_options:
-            path = game_state.find_path_to_edge(location)
+        # Get the damage estimate each path will take, finding the paths from every location at once
+        # game_state.get_paths_damage_profile gives a finer estimate, counting the frames each unit type spends on a location
+        turret_damage = gamelib.GameUnit(TURRET, game_state.config).damage_i
+        for path in game_state.find_paths_to_edge_batch(location_options):
             damage = 0
             for path_location in path:
                 # Get number of enemy turrets that can attack each location and multiply by turret damage
-                damage += len(game_state.get_attackers(path_location, 0)) * gamelib.GameUnit(TURRET, game_state.config).damage_i
+                damage += len(game_state.get_attackers(path_location, 0)) * turret_damage
             damages.append(damage)
         
         # Now just return the location that takes the least damage
@@ -197,11 +200,10 @@ class AlgoStrategy(gamelib.AlgoCore):
 
     def detect_enemy_unit(self, game_state, unit_type=None, valid_x = None, valid_y = None):
         total_units = 0
-        for location in game_state.game_map:
-            if game_state.contains_stationary_unit(location):
-                for unit in game_state.game_map[location]:
-                    if unit.player_index == 1 and (unit_type is None or unit.unit_type == unit_type) and (valid_x is None or location[0] in valid_x) and (valid_y is None or location[1] in valid_y):
-                        total_units += 1
+        # The map keeps an index of structures by owner and type, so we only visit the enemy structures we care about
+        for location in game_state.game_map.get_structure_locations(player_index=1, unit_type=unit_type):
+            if (valid_x is None or location[0] in valid_x) and (valid_y is None or location[1] in valid_y):
+                total_units += 1
         return total_units
         
     def filter_blocked_locations(self, locations, game_state):
@@ -219,7 +221,8 @@ class AlgoStrategy(gamelib.AlgoCore):
         Full doc on format of a game frame at in json-docs.html in the root of the Starterkit.
         """
         # Let's record at what position we get scored on
-        state = json.loads(turn_string)
+        # The frame was already parsed when it was read, parse_message gets that json instead of parsing it again
+        state = gamelib.parse_message(turn_string)
         events = state["events"]
         breaches = events["breach"]
         for breach in breaches:
@@ -10,20 +10,33 @@ Investigating it is useful for any player that wants to access more information
 The GameUnit class in unit.py represents a single unit. 
 Investigating it is useful for any player that wants to access information about units. \n
 
+The UnitTable class in unit_table.py holds every unit of a game state as columns, from GameState.get_unit_table(). 
+It is useful for queries over many units, like the health of the enemy's structures on each row, that should not create GameUnits. \n
+
 The AlgoCore class in algocore.py handles communication with the game engine, and forms the bones of an algo. AlgoStrategy inherits from it. 
 Investigating it is useful for advanced players interested in getting data from the action phase or communicating directly with the game engine. \n
 
 The Navigation class in navigation.py contains functions related to path-finding, which are used by GameState in pathing related functions. 
 Investigating it is useful for advanced player who want to optimize the slow default pathing algorithm we provide. \n 
 
-util.py contains a small handful of functions that help with communication, including the debug-printing function, debug_write().
+simulation.py contains simulate(), which plays out an action phase on a copy of a GameState's board, frame by frame, 
+to predict breaches, damage and destroyed structures without the game engine. \n
+
+The RolloutPool class in rollout_pool.py scores candidate turns in several worker processes, each candidate a list of actions 
+tried on a copy of the GameState. AlgoCore.start_rollout_pool starts one for the game, and closes it when the game ends. \n
+
+util.py contains a small handful of functions that help with communication, including the debug-printing function, debug_write(), 
+and parse_message(), which gets the parsed json of a game state or action frame without parsing it again.
 """
 
 from .algocore import AlgoCore
-from .util import debug_write
+from .util import debug_write, parse_message
 from .game_state import GameState
 from .unit import GameUnit
 from .game_map import GameMap
+from .unit_table import UnitTable
+from .simulation import simulate
+from .rollout_pool import RolloutPool
 
-__all__ = ["algocore", "game_state", "game_map", "navigation", "unit", "util"]
+__all__ = ["algocore", "game_state", "game_map", "navigation", "rollout_pool", "simulation", "unit", "unit_table", "util"]
  
\ No newline at end of file
@@ -1,7 +1,7 @@
-import json
-
 from .game_state import GameState
-from .util import get_command, debug_write, BANNER_TEXT, send_command
+from .util import get_command, debug_write, BANNER_TEXT, send_command, load_json, GameMessage
+from .unit import compile_unit_prototypes
+from .rollout_pool import RolloutPool
 
 class AlgoCore(object):
     """
@@ -10,10 +10,12 @@ class AlgoCore(object):
 
     Attributes :
         * config (JSON): json object containing information about the game
+        * rollout_pool (RolloutPool): The pool started by start_rollout_pool, None if it was not started
 
     """
     def __init__(self):
         self.config = None
+        self.rollout_pool = None
 
     def on_game_start(self, config):
         """
@@ -27,6 +29,7 @@ class AlgoCore(object):
         """
         This step function is called at the start of each turn.
         It is passed the current game state, which can be used to initiate a new GameState object. 
+        The game state is a GameMessage, a string that also carries its parsed json so GameState does not parse it again. 
         By default, it sends empty commands to the game engine. \n
         algo_strategy.py inherits from AlgoCore and overrides this on turn function. 
         Adjusting the on_turn function in algo_strategy is the main way to adjust your algo's logic. 
@@ -40,9 +43,29 @@ class AlgoCore(object):
         The action phase is made up of a sequence of distinct frames. 
         Each of these frames is sent to the algo in order. 
         They can be handled in this function. 
+        Like the game state passed to on_turn, each frame is a GameMessage, use parse_message to get its parsed json. 
         """
         pass
 
+    def start_rollout_pool(self, processes=None):
+        """
+        Starts a RolloutPool to score candidate turns in other processes, with rollout_pool.evaluate. 
+        Call it from on_game_start, after the config is set, so the workers start before the first turn. 
+        The pool is closed when the game ends. \n
+        Returns the pool, starting it only once per game
+        """
+        if self.rollout_pool is None:
+            self.rollout_pool = RolloutPool(self.config, processes)
+        return self.rollout_pool
+
+    def close_rollout_pool(self):
+        """
+        Stops the worker processes of the rollout pool, if it was started
+        """
+        if self.rollout_pool is not None:
+            self.rollout_pool.close()
+            self.rollout_pool = None
+
 
     def start(self):
         """ 
@@ -53,43 +76,58 @@ class AlgoCore(object):
         """
         debug_write(BANNER_TEXT)
 
-        while True:
-            # Note: Python blocks and hangs on stdin. Can cause issues if connections aren't setup properly and may need to
-            # manually kill this Python program.
-            game_state_string = get_command()
-            if "replaySave" in game_state_string:
-                """
-                This means this must be the config file. So, load in the config file as a json and add it to your AlgoStrategy class.
-                """
-                parsed_config = json.loads(game_state_string)
-                self.on_game_start(parsed_config)
-            elif "turnInfo" in game_state_string:
-                state = json.loads(game_state_string)
-                stateType = int(state.get("turnInfo")[0])
-                if stateType == 0:
-                    """
-                    This is the game turn game state message. Algo must now print to stdout 2 lines, one for build phase one for
-                    deploy phase. Printing is handled by the provided functions.
+        try:
+            while True:
+                # Note: Python blocks and hangs on stdin. Can cause issues if connections aren't setup properly and may need to
+                # manually kill this Python program.
+                game_state_string = get_command()
+                try:
+                    state = load_json(game_state_string)
+                except ValueError:
+                    state = None
+                if not isinstance(state, dict):
                     """
-                    self.on_turn(game_state_string)
-                elif stateType == 1:
-                    """
-                    If stateType == 1, this game_state_string string represents a single frame of an action phase
+                    Something is wrong? Received an incorrect or improperly formatted string.
                     """
-                    self.on_action_frame(game_state_string)
-                elif stateType == 2:
+                    debug_write("Got unexpected string : {}".format(game_state_string))
+                elif "turnInfo" in state:
+                    # Every message is only parsed once, on_turn and on_action_frame get the string along with its parsed json
+                    game_state_string = GameMessage(game_state_string, state)
+                    stateType = int(state.get("turnInfo")[0])
+                    if stateType == 0:
+                        """
+                        This is the game turn game state message. Algo must now print to stdout 2 lines, one for build phase one for
+                        deploy phase. Printing is handled by the provided functions.
+                        """
+                        self.on_turn(game_state_string)
+                    elif stateType == 1:
+                        """
+                        If stateType == 1, this game_state_string string represents a single frame of an action phase
+                        """
+                        self.on_action_frame(game_state_string)
+                    elif stateType == 2:
+                        """
+                        This is the end game message. This means the game is over so break and finish the program.
+                        """
+                        debug_write("Got end state, game over. Stopping algo.")
+                        break
+                    else:
+                        """
+                        Something is wrong? Received an incorrect or improperly formatted string.
+                        """
+                        debug_write("Got unexpected string with turnInfo: {}".format(game_state_string))
+                elif "replaySave" in game_state_string:
                     """
-                    This is the end game message. This means the game is over so break and finish the program.
+                    This means this must be the config file. So, load in the config file as a json and add it to your AlgoStrategy class.
                     """
-                    debug_write("Got end state, game over. Stopping algo.")
-                    break
+                    # The stats of every unit type are compiled once per game, and shared by all of its GameUnits
+                    compile_unit_prototypes(state)
+                    self.on_game_start(state)
                 else:
                     """
                     Something is wrong? Received an incorrect or improperly formatted string.
                     """
-                    debug_write("Got unexpected string with turnInfo: {}".format(game_state_string))
-            else:
-                """
-                Something is wrong? Received an incorrect or improperly formatted string.
-                """
-                debug_write("Got unexpected string : {}".format(game_state_string))
+                    debug_write("Got unexpected string : {}".format(game_state_string))
+        finally:
+            # The rollout pool is stopped on the end message, or if the engine closes stdin first
+            self.close_rollout_pool()
@@ -1,7 +1,564 @@
+import copy
+import functools
 import math
+import random
 from .unit import GameUnit
 from .util import debug_write
 
+ARENA_SIZE = 28
+HALF_ARENA = ARENA_SIZE // 2
+
+
+def _in_diamond(x, y):
+    """Diamond bounds arithmetic used to build the precomputed bounds mask.
+    Also used directly for non-integer locations.
+    """
+    row_size = y + 1
+    startx = HALF_ARENA - row_size
+    endx = startx + (2 * row_size) - 1
+    top_half_check = (y < HALF_ARENA and x >= startx and x <= endx)
+
+    row_size = (ARENA_SIZE - 1 - y) + 1
+    startx = HALF_ARENA - row_size
+    endx = startx + (2 * row_size) - 1
+    bottom_half_check = (y >= HALF_ARENA and x >= startx and x <= endx)
+
+    return bottom_half_check or top_half_check
+
+"""
+Precomputed board layout. There are 420 playable cells. Each one has a cell index
+(0-419) that is used to address the flat per-cell arrays kept by GameMap. Cells are
+numbered row by row starting at the bottom, left to right within a row.
+
+    * BOUNDS_MASK: Indexed by x * ARENA_SIZE + y, True if that location is on the board
+    * CELL_LOCATIONS: Indexed by cell index, the (x, y) location of that cell
+    * CELL_INDEX: Indexed by x * ARENA_SIZE + y, the cell index of that location or -1
+"""
+BOUNDS_MASK = tuple(_in_diamond(x, y) for x in range(ARENA_SIZE) for y in range(ARENA_SIZE))
+CELL_LOCATIONS = tuple((x, y) for y in range(ARENA_SIZE) for x in range(ARENA_SIZE) if _in_diamond(x, y))
+CELL_COUNT = len(CELL_LOCATIONS)
+_cell_index = [-1] * (ARENA_SIZE * ARENA_SIZE)
+for _index, (_x, _y) in enumerate(CELL_LOCATIONS):
+    _cell_index[_x * ARENA_SIZE + _y] = _index
+CELL_INDEX = tuple(_cell_index)
+del _cell_index, _index, _x, _y
+"""ROW_START[y] is the cell index of the first cell in row y, ROW_START[ARENA_SIZE] is CELL_COUNT"""
+ROW_START = tuple([sum(1 for _, y in CELL_LOCATIONS if y < row) for row in range(ARENA_SIZE + 1)])
+
+
+def _row_cells(rows):
+    """
+    Gets the cell indexes [first, last) of the rows min_y <= y <= max_y of a [min_y, max_y] pair, clamped to the board.
+    Bands entirely off the board, or with min_y > max_y, give first >= last so no cell is inside them.
+    """
+    first_row = min(max(rows[0], 0), ARENA_SIZE)
+    last_row = min(max(rows[1] + 1, 0), ARENA_SIZE)
+    return ROW_START[first_row], ROW_START[last_row]
+
+
+TOP_RIGHT = 0
+TOP_LEFT = 1
+BOTTOM_LEFT = 2
+BOTTOM_RIGHT = 3
+
+
+def _edge_locations(edge):
+    locations = []
+    for num in range(0, HALF_ARENA):
+        if edge == TOP_RIGHT:
+            locations.append((HALF_ARENA + num, ARENA_SIZE - 1 - num))
+        elif edge == TOP_LEFT:
+            locations.append((HALF_ARENA - 1 - num, ARENA_SIZE - 1 - num))
+        elif edge == BOTTOM_LEFT:
+            locations.append((HALF_ARENA - 1 - num, num))
+        else:
+            locations.append((HALF_ARENA + num, num))
+    return tuple(locations)
+
+"""
+Precomputed edges, indexed by edge constant (TOP_RIGHT, TOP_LEFT, BOTTOM_LEFT, BOTTOM_RIGHT).
+
+    * EDGE_LOCATIONS: The (x, y) locations along each edge, in the order returned by get_edges
+    * EDGE_SETS: The same locations as frozensets, for membership tests
+    * EDGE_MASK: Indexed by x * ARENA_SIZE + y, a bitmask with bit (1 << edge) set for every edge the location is on
+"""
+EDGE_LOCATIONS = tuple(_edge_locations(edge) for edge in (TOP_RIGHT, TOP_LEFT, BOTTOM_LEFT, BOTTOM_RIGHT))
+EDGE_SETS = tuple(frozenset(locations) for locations in EDGE_LOCATIONS)
+_edge_mask = [0] * (ARENA_SIZE * ARENA_SIZE)
+for _edge, _locations in enumerate(EDGE_LOCATIONS):
+    for _x, _y in _locations:
+        _edge_mask[_x * ARENA_SIZE + _y] |= 1 << _edge
+EDGE_MASK = tuple(_edge_mask)
+del _edge_mask, _edge, _locations, _x, _y
+FRIENDLY_EDGES_MASK = (1 << BOTTOM_LEFT) | (1 << BOTTOM_RIGHT)
+ENEMY_EDGES_MASK = (1 << TOP_LEFT) | (1 << TOP_RIGHT)
+
+
+def edge_bits(location):
+    """Gets the edges a location lies on
+
+    Args:
+        location: A map location
+
+    Returns:
+        A bitmask with bit (1 << edge) set for every edge the location is on, 0 if it is not on an edge
+
+    """
+    x, y = location
+    if type(x) is not int or type(y) is not int:
+        if x != int(x) or y != int(y):
+            return 0
+        x, y = int(x), int(y)
+    if 0 <= x < ARENA_SIZE and 0 <= y < ARENA_SIZE:
+        return EDGE_MASK[x * ARENA_SIZE + y]
+    return 0
+
+
+def edge_location_set(locations):
+    """Gets a set of (x, y) tuples for a list of locations.
+    Edges returned by get_edge_locations map onto the precomputed EDGE_SETS.
+
+    Args:
+        locations: A list of locations
+
+    Returns:
+        A frozenset containing each location as an (x, y) tuple
+
+    """
+    if len(locations) == HALF_ARENA:
+        for edge, edge_locations in enumerate(EDGE_LOCATIONS):
+            if all(location[0] == edge_location[0] and location[1] == edge_location[1] for location, edge_location in zip(locations, edge_locations)):
+                return EDGE_SETS[edge]
+    return frozenset((location[0], location[1]) for location in locations)
+
+
+def _mix64(value):
+    """splitmix64 finalizer, used to derive Zobrist keys"""
+    value = (value + 0x9E3779B97F4A7C15) & 0xFFFFFFFFFFFFFFFF
+    value = ((value ^ (value >> 30)) * 0xBF58476D1CE4E5B9) & 0xFFFFFFFFFFFFFFFF
+    value = ((value ^ (value >> 27)) * 0x94D049BB133111EB) & 0xFFFFFFFFFFFFFFFF
+    return value ^ (value >> 31)
+
+"""
+Zobrist keys. ZOBRIST_KEYS is indexed by ((cell index * 2 + owner) * 3 + structure type) * 2 + upgraded for the
+three structure types, BLOCKED_KEYS by cell index. The keys are fixed so hashes can be compared across GameStates.
+"""
+_zobrist_random = random.Random(0x5EED)
+ZOBRIST_KEYS = tuple(_zobrist_random.getrandbits(64) for _ in range(CELL_COUNT * 2 * 3 * 2))
+BLOCKED_KEYS = tuple(_zobrist_random.getrandbits(64) for _ in range(CELL_COUNT))
+del _zobrist_random
+
+
+def zobrist_key(index, owner, structure_type, upgraded):
+    """Gets the Zobrist key of a structure
+
+    Args:
+        index: The cell index of the structure
+        owner: The player_index of the structure
+        structure_type: The unitInformation index of the structure
+        upgraded: True if the structure is upgraded
+
+    Returns:
+        A 64 bit int
+
+    """
+    if (owner == 0 or owner == 1) and 0 <= structure_type < 3:
+        return ZOBRIST_KEYS[((index * 2 + owner) * 3 + structure_type) * 2 + (1 if upgraded else 0)]
+    return _mix64(hash((index, owner, structure_type, bool(upgraded))))
+
+
+"""
+Bitboards. A set of locations is stored as an int with bit (x * ARENA_SIZE + y) set for each location,
+the same flat index as BOUNDS_MASK. Sets can be combined with |, &, ^ and & ~.
+
+    * BOARD_BITS: Every location on the board
+    * HALF_BITS: Indexed by player_index, the locations on that player's half of the board
+"""
+BOARD_BITS = sum(1 << flat for flat, in_bounds in enumerate(BOUNDS_MASK) if in_bounds)
+HALF_BITS = (
+    sum(1 << (x * ARENA_SIZE + y) for x, y in CELL_LOCATIONS if y < HALF_ARENA),
+    sum(1 << (x * ARENA_SIZE + y) for x, y in CELL_LOCATIONS if y >= HALF_ARENA))
+"""CELL_BITS[index] is the bitboard containing only the cell with that cell index"""
+CELL_BITS = tuple(1 << (x * ARENA_SIZE + y) for x, y in CELL_LOCATIONS)
+_ROW_BITS = tuple(sum(1 << (x * ARENA_SIZE + y) for x in range(ARENA_SIZE)) for y in range(ARENA_SIZE))
+"""_SHIFT_SOURCE_BITS[dy + ARENA_SIZE - 1] keeps the rows that stay on the grid when moved by dy"""
+_SHIFT_SOURCE_BITS = tuple(
+    sum(_ROW_BITS[y] for y in range(ARENA_SIZE) if 0 <= y + dy < ARENA_SIZE)
+    for dy in range(1 - ARENA_SIZE, ARENA_SIZE))
+
+
+def location_bit(location):
+    """Gets the bitboard containing a single location
+
+    Args:
+        location: A map location, [x, y]
+
+    Returns:
+        An int with only that location's bit set
+
+    """
+    return 1 << (int(location[0]) * ARENA_SIZE + int(location[1]))
+
+
+def locations_to_bits(locations):
+    """Gets the bitboard containing a list of locations
+
+    Args:
+        locations: A list of map locations
+
+    Returns:
+        An int with the bit of each location set
+
+    """
+    bits = 0
+    for x, y in locations:
+        bits |= 1 << (int(x) * ARENA_SIZE + int(y))
+    return bits
+
+
+def bits_to_locations(bits):
+    """Gets the locations in a bitboard
+
+    Args:
+        bits: A bitboard
+
+    Returns:
+        A list of [x, y] locations, sorted by x then y
+
+    """
+    locations = []
+    while bits:
+        lowest = bits & -bits
+        flat = lowest.bit_length() - 1
+        locations.append([flat // ARENA_SIZE, flat % ARENA_SIZE])
+        bits ^= lowest
+    return locations
+
+
+def popcount(bits):
+    """Counts the locations in a bitboard
+
+    Args:
+        bits: A bitboard
+
+    Returns:
+        The number of set bits
+
+    """
+    return bin(bits).count("1")
+
+
+def shift_bits(bits, dx, dy):
+    """Moves every location in a bitboard by (dx, dy), dropping locations that leave the board
+
+    Args:
+        bits: A bitboard
+        dx: The change in x
+        dy: The change in y
+
+    Returns:
+        The shifted bitboard
+
+    """
+    if not -ARENA_SIZE < dy < ARENA_SIZE:
+        return 0
+    bits &= _SHIFT_SOURCE_BITS[dy + ARENA_SIZE - 1]
+    offset = dx * ARENA_SIZE + dy
+    if offset >= 0:
+        bits <<= offset
+    else:
+        bits >>= -offset
+    return bits & BOARD_BITS
+
+
+def expand_bits(bits, steps=1):
+    """Grows a bitboard by adding the up, down, left and right neighbours of every location
+
+    Args:
+        bits: A bitboard
+        steps: The number of times to grow it
+
+    Returns:
+        The grown bitboard, limited to the board
+
+    """
+    for _ in range(steps):
+        bits = (bits | (bits << ARENA_SIZE) | (bits >> ARENA_SIZE) |
+                ((bits & _SHIFT_SOURCE_BITS[ARENA_SIZE]) << 1) |
+                ((bits & _SHIFT_SOURCE_BITS[ARENA_SIZE - 2]) >> 1)) & BOARD_BITS
+    return bits
+
+
+def range_bits(bits, radius, get_hit_radius=0):
+    """Gets every location within a radius of some location in a bitboard, using the same
+    distance rule as get_locations_in_range
+
+    Args:
+        bits: A bitboard
+        radius: The radius of the area around each location
+        get_hit_radius: The getHitRadius from the game config
+
+    Returns:
+        The bitboard of covered locations
+
+    """
+    covered = 0
+    for dx, dy in range_stencil(radius, get_hit_radius):
+        covered |= shift_bits(bits, dx, dy)
+    return covered
+
+
+"""
+Stencils and the tables built from them are cached per argument set. Games only use the few radii in their
+config, the caches are bounded so that callers sweeping many radii do not grow them without limit.
+"""
+_RANGE_CACHE_SIZE = 64
+
+
+@functools.lru_cache(maxsize=_RANGE_CACHE_SIZE)
+def range_stencil(radius, get_hit_radius):
+    """Gets the relative offsets covered by a circular area, built once per (radius, get_hit_radius)
+
+    Args:
+        radius: The radius of the area
+        get_hit_radius: The getHitRadius from the game config
+
+    Returns:
+        A tuple of (dx, dy) offsets whose distance from the center is less than radius + get_hit_radius,
+        in the order get_locations_in_range returns them
+
+    """
+    search_radius = math.ceil(radius)
+    offsets = []
+    for i in range(-search_radius, search_radius + 1):
+        for j in range(-search_radius, search_radius + 1):
+            if math.sqrt(i ** 2 + j ** 2) < radius + get_hit_radius:
+                offsets.append((i, j))
+    return tuple(offsets)
+
+
+def target_rings(radius, get_hit_radius):
+    """Groups the offsets of range_stencil by their distance from the center, built once per (radius, get_hit_radius).
+    Used to find the nearest targets of a unit without checking its whole range.
+
+    Args:
+        radius: The radius of the area
+        get_hit_radius: The getHitRadius from the game config
+
+    Returns:
+        A tuple of (distance, offsets) in increasing distance, offsets being a tuple of (order, dx, dy)
+        where order is the offset's position in range_stencil
+
+    """
+    return _target_tables(radius, get_hit_radius)[0]
+
+
+@functools.lru_cache(maxsize=_RANGE_CACHE_SIZE)
+def _target_tables(radius, get_hit_radius):
+    """
+    Builds target_rings, and the position in range_stencil of each (dx, dy) offset in range.
+    """
+    by_distance = {}
+    for order, (dx, dy) in enumerate(range_stencil(radius, get_hit_radius)):
+        by_distance.setdefault(math.sqrt(dx ** 2 + dy ** 2), []).append((order, dx, dy))
+    rings = tuple((distance, tuple(by_distance[distance])) for distance in sorted(by_distance))
+    return rings, {(dx, dy): order for _, offsets in rings for order, dx, dy in offsets}
+
+
+def find_target(x, y, player_index, attack_range, damage_i, damage_f, enemy_units, get_hit_radius):
+    """Finds the unit an attacker would target, with the rules of GameState.get_target:
+    mobile units first, then the nearest, the lowest health, the lowest y (highest for player 1),
+    and the furthest from the center of the board. Ties go to the first unit in range_stencil and cell order.
+
+    Args:
+        x: The x coordinate of the attacker, an int
+        y: The y coordinate of the attacker, an int
+        player_index: The player_index of the attacker
+        attack_range: The attackRange of the attacker
+        damage_i: The attackDamageWalker of the attacker, mobile units are only targeted if it is not 0
+        damage_f: The attackDamageTower of the attacker, structures are only targeted if it is not 0
+        enemy_units: A pair (mobile units, structures), each a dict from flat index to the list of
+            units there, in cell order. Units need health, x and y
+        get_hit_radius: The getHitRadius from the game config
+
+    Returns:
+        The targeted unit, or None if there is no target in range
+
+    """
+    lowest_y = player_index == 0
+    center_x = HALF_ARENA - 0.5
+    rings, orders = _target_tables(attack_range, get_hit_radius)
+    for units_by_cell, can_attack in zip(enemy_units, (damage_i != 0, damage_f != 0)):
+        if not units_by_cell or not can_attack:
+            continue
+        if len(units_by_cell) * 2 < len(orders):
+            # Far fewer occupied cells than locations in range, so check each of them
+            target = None
+            target_key = None
+            for flat, units in units_by_cell.items():
+                dx = flat // ARENA_SIZE - x
+                dy = flat % ARENA_SIZE - y
+                order = orders.get((dx, dy))
+                if order is None:
+                    continue
+                distance = math.sqrt(dx ** 2 + dy ** 2)
+                for cell_order, unit in enumerate(units):
+                    unit_key = (distance, unit.health, unit.y if lowest_y else -unit.y, -abs(center_x - unit.x), order, cell_order)
+                    if target is None or unit_key < target_key:
+                        target = unit
+                        target_key = unit_key
+            if target is not None:
+                return target
+            continue
+        for _, offsets in rings:
+            target = None
+            target_key = None
+            for _, dx, dy in offsets:
+                new_x = x + dx
+                new_y = y + dy
+                if 0 <= new_x < ARENA_SIZE and 0 <= new_y < ARENA_SIZE:
+                    for unit in units_by_cell.get(new_x * ARENA_SIZE + new_y, ()):
+                        # Lowest health, then lowest or highest y, then furthest from the center
+                        unit_key = (unit.health, unit.y if lowest_y else -unit.y, -abs(center_x - unit.x))
+                        if target is None or unit_key < target_key:
+                            target = unit
+                            target_key = unit_key
+            if target is not None:
+                return target
+    return None
+
+
+@functools.lru_cache(maxsize=_RANGE_CACHE_SIZE)
+def coverage_stencil(attack_range, max_radius, get_hit_radius):
+    """Gets the relative offsets a unit with a given attack range can attack, built once per argument set.
+    GameState.get_attackers only considers attackers within max_radius, so offsets are limited to that too.
+
+    Args:
+        attack_range: The attackRange of the unit
+        max_radius: The largest attackRange in the game config
+        get_hit_radius: The getHitRadius from the game config
+
+    Returns:
+        A tuple of (dx, dy) offsets within attack_range of the unit and inside range_stencil(max_radius, get_hit_radius)
+
+    """
+    return tuple((i, j) for i, j in range_stencil(max_radius, get_hit_radius) if math.sqrt(i ** 2 + j ** 2) <= attack_range)
+
+
+def locations_in_range(x, y, radius, get_hit_radius):
+    """Gets the on-board locations covered by a circular area around an integer location.
+    Results are cached per center, so repeated queries are a dictionary and list lookup.
+
+    Args:
+        x: The x coordinate of the center, an int
+        y: The y coordinate of the center, an int
+        radius: The radius of the area
+        get_hit_radius: The getHitRadius from the game config
+
+    Returns:
+        A tuple of (x, y) tuples, in the order get_locations_in_range returns them
+
+    """
+    by_center = _range_locations(radius, get_hit_radius)
+    if 0 <= x < ARENA_SIZE and 0 <= y < ARENA_SIZE:
+        center = x * ARENA_SIZE + y
+        locations = by_center.get(center)
+        if locations is None:
+            locations = by_center[center] = _scan_stencil(range_stencil(radius, get_hit_radius), x, y)
+        return locations
+    return _scan_stencil(range_stencil(radius, get_hit_radius), x, y)
+
+
+@functools.lru_cache(maxsize=_RANGE_CACHE_SIZE)
+def _range_locations(radius, get_hit_radius):
+    """
+    The locations_in_range results for one radius, by the flat index of their center, filled in as centers are queried.
+    """
+    return {}
+
+
+def _scan_stencil(stencil, x, y):
+    """
+    Adds each offset of a stencil to an integer location, keeping the results on the board.
+    """
+    found = []
+    for dx, dy in stencil:
+        new_x = x + dx
+        new_y = y + dy
+        if 0 <= new_x < ARENA_SIZE and 0 <= new_y < ARENA_SIZE and BOUNDS_MASK[new_x * ARENA_SIZE + new_y]:
+            found.append((new_x, new_y))
+    return tuple(found)
+
+
+def _cell_change(name):
+    """
+    Wraps a list method that changes a _CellUnits in place, so the map it belongs to can update its indexes.
+    """
+    change = getattr(list, name)
+
+    def changed(self, *args):
+        game_map = getattr(self, "_game_map", None)
+        if game_map is None:
+            return change(self, *args)
+        return game_map._change_cell(self, change, args)
+    changed.__name__ = name
+    return changed
+
+
+class _CellUnits(list):
+    """
+    The list of units at a location, as game_map[x, y] returns it. Changing it in place, with append, remove and the
+    other list methods, updates the map's structure arrays and indexes like game_map[x, y] = units does.
+    Copies and pickles of it are plain lists.
+    """
+    __slots__ = ("_game_map", "_index")
+
+    def __init__(self, units, game_map, index):
+        list.__init__(self, units)
+        self._game_map = game_map
+        self._index = index
+
+    def __reduce_ex__(self, protocol):
+        return list, (list(self),)
+
+    for _name in ("append", "extend", "insert", "remove", "pop", "clear", "sort", "reverse",
+                  "__setitem__", "__delitem__", "__iadd__", "__imul__"):
+        locals()[_name] = _cell_change(_name)
+    del _name
+
+
+class _UnparsedUnit:
+    """
+    Stands in for a GameUnit parsed from the game state until its location is first read.
+    Has the attributes the map's indexes need, and counts upgrades instead of applying them.
+    """
+    __slots__ = ("unit_type", "player_index", "health", "x", "y", "stationary", "upgrades", "pending_removal")
+
+    def __init__(self, unit_type, player_index, health, x, y, stationary):
+        self.unit_type = unit_type
+        self.player_index = player_index
+        self.health = health
+        self.x = x
+        self.y = y
+        self.stationary = stationary
+        self.upgrades = 0
+        self.pending_removal = False
+
+    @property
+    def upgraded(self):
+        return self.upgrades > 0
+
+    def upgrade(self):
+        self.upgrades += 1
+
+    def create_unit(self, config):
+        unit = GameUnit(self.unit_type, config, self.player_index, self.health, self.x, self.y)
+        for _ in range(self.upgrades):
+            unit.upgrade()
+        unit.pending_removal = self.pending_removal
+        return unit
+
+
 class GameMap:
     """Holds data about the current game map and provides functions
     useful for getting information related to the map.
@@ -9,6 +566,11 @@ class GameMap:
     game_map[x, y] will return a list of Units located at that location, 
     or an empty list if there are no units at the location
 
+    Alongside those lists, the map keeps flat arrays describing the structure (if any) in every cell.
+    They are indexed by cell index, see CELL_INDEX, and are kept up to date by add_unit, remove_unit,
+    game_map[x, y] = units and by changing the list returned by game_map[x, y] in place, for example with
+    game_map[x, y].append(unit). Changing a GameUnit's stats or owner directly is not tracked.
+
     Attributes :
         * config (JSON): Contains information about the current game rules
         * enable_warnings (bool): If true, debug messages for game_map functions will print out
@@ -18,6 +580,13 @@ class GameMap:
         * TOP_LEFT (int): A constant that represents the top left edge
         * BOTTOM_LEFT (int): Hidden challenge! Can you guess what this constant represents???
         * BOTTOM_RIGHT (int): A constant that represents the bottom right edge
+        * structure_type (list): Per cell index, the unitInformation index of the structure there, or -1
+        * structure_owner (list): Per cell index, the player_index of the structure there, or -1
+        * structure_health (list): Per cell index, the health of the structure there when it was placed, or 0
+        * structure_upgraded (list): Per cell index, True if the structure there is upgraded
+        * zobrist_hash (int): 64 bit Zobrist hash of the (cell, owner, type, upgraded) of every structure on the map
+        * blocked_hash (int): 64 bit Zobrist hash of the set of cells that contain a structure
+        * blocked_bits (int): Bitboard of the locations that contain a structure, see BOARD_BITS
 
     """
     def __init__(self, config):
@@ -31,49 +600,589 @@ class GameMap:
         self.enable_warnings = True
         self.ARENA_SIZE = 28
         self.HALF_ARENA = int(self.ARENA_SIZE / 2)
-        self.TOP_RIGHT = 0
-        self.TOP_LEFT = 1
-        self.BOTTOM_LEFT = 2
-        self.BOTTOM_RIGHT = 3
+        self.TOP_RIGHT = TOP_RIGHT
+        self.TOP_LEFT = TOP_LEFT
+        self.BOTTOM_LEFT = BOTTOM_LEFT
+        self.BOTTOM_RIGHT = BOTTOM_RIGHT
+        self.__next_cell = 0
+        self.__type_index = {}
+        self.__unit_information = {}
+        for index, unit_information in enumerate(config.get("unitInformation", [])):
+            self.__type_index[unit_information.get("shorthand")] = index
+            self.__unit_information[unit_information.get("shorthand")] = unit_information
+        unit_information = config.get("unitInformation") or [{}]
+        self.__get_hit_radius = unit_information[0].get("getHitRadius", 0)
+        self.__max_attack_range = 0
+        for unit in unit_information:
+            if unit.get("attackRange", 0) >= self.__max_attack_range:
+                self.__max_attack_range = unit.get("attackRange", 0)
         self.__map = self.__empty_grid()
-        self.__start = [13,0]
+        self.__unparsed = set()
+        self.__structures = [None] * CELL_COUNT
+        self.__structure_keys = [None] * CELL_COUNT
+        self.__structure_index = {}
+        self.__mobile_index = {}
+        self.__coverage = None
+        self.__indexes_shared = False
+        self.zobrist_hash = 0
+        self.blocked_hash = 0
+        self.blocked_bits = 0
+        self.__structure_bits = {}
+        self.structure_type = [-1] * CELL_COUNT
+        self.structure_owner = [-1] * CELL_COUNT
+        self.structure_health = [0] * CELL_COUNT
+        self.structure_upgraded = [False] * CELL_COUNT
+        self._copy_on_write = False
+        self._journal = None
     
     def __getitem__(self, location):
-        if len(location) == 2 and self.in_arena_bounds(location):
-            x,y = location
-            return self.__map[x][y]
+        if len(location) == 2:
+            x, y = location
+            if 0 <= x < self.ARENA_SIZE and 0 <= y < self.ARENA_SIZE:
+                index = CELL_INDEX[x * ARENA_SIZE + y]
+                if index >= 0:
+                    if index in self.__unparsed:
+                        self.__create_units(index)
+                    return self.__cell_units(index)
         self._invalid_coordinates(location)
 
     def __setitem__(self, location, val):
         if type(location) == tuple and len(location) == 2 and self.in_arena_bounds(location):
-            self.__map[location[0]][location[1]] = val
+            self._set_cell(CELL_INDEX[location[0] * ARENA_SIZE + location[1]], val)
             return
         self._invalid_coordinates(location)
 
+    def units_at(self, x, y):
+        """Fast, unchecked version of game_map[x, y]
+
+        Args:
+            x: The x coordinate of a location, must be an int on the board
+            y: The y coordinate of a location, must be an int on the board
+
+        Returns:
+            The list of units at that location. The result is undefined for locations that are not on the board.
+
+        """
+        index = CELL_INDEX[x * ARENA_SIZE + y]
+        if index in self.__unparsed:
+            self.__create_units(index)
+        return self.__cell_units(index)
+
+    def __cell_units(self, index):
+        """
+        Gets the units at a cell index as a list bound to this map, so that changing it in place updates this map.
+        Lists made by another map, such as the one this map was forked from, are copied the first time they are read.
+        """
+        units = self.__map[index]
+        if units.__class__ is not _CellUnits or units._game_map is not self:
+            units = self.__map[index] = _CellUnits(units, self, index)
+        return units
+
+    def _change_cell(self, units, change, args):
+        """
+        Applies a change to the list of units at a cell, made in place through the list, and updates the indexes.
+        """
+        index = units._index
+        if self.__map[index] is not units:
+            # The map no longer holds this list, so changing it does not change the map
+            return change(units, *args)
+        if self._copy_on_write or self._journal is not None:
+            # The list may be shared with a fork or recorded by a journal, so the map gets a changed copy
+            changed = list(units)
+            result = change(changed, *args)
+            self._set_cell(index, changed)
+            return result
+        self._unindex_cell(index)
+        result = change(units, *args)
+        self._index_cell(index)
+        return result
+
+    def structure_at(self, x, y):
+        """Fast, unchecked lookup of the structure at a location
+
+        Args:
+            x: The x coordinate of a location, must be an int on the board
+            y: The y coordinate of a location, must be an int on the board
+
+        Returns:
+            The structure GameUnit at that location, or None. The result is undefined for locations that are not on the board.
+
+        """
+        index = CELL_INDEX[x * ARENA_SIZE + y]
+        if index in self.__unparsed:
+            self.__create_units(index)
+        return self.__structures[index]
+
     def __iter__(self):
-        self.__start = [13,0]
-        return self
-    
+        self.__next_cell = 0
+        return ([x, y] for x, y in CELL_LOCATIONS)
+
     def __next__(self):
-        location = self.__start
-        if location == [15,27]:
+        # Kept for code that calls next(game_map) directly, as it could when the map was its own iterator.
+        # Like before, the position is shared and iter(game_map) starts it over. Loops use the independent iterators above
+        if self.__next_cell >= CELL_COUNT:
             raise StopIteration
-        new_location = [location[0]+1, location[1]]
-        while not self.in_arena_bounds(new_location) and not location == [14,27]:
-            if new_location[0] == self.ARENA_SIZE:
-                new_location = [0, new_location[1]+1]
-            else:
-                new_location = [new_location[0]+1, new_location[1]]
-        self.__start = new_location
-        return location 
+        x, y = CELL_LOCATIONS[self.__next_cell]
+        self.__next_cell += 1
+        return [x, y]
+
+    def iter_locations(self, player_index=None, rows=None, occupied_only=False, structures_only=False):
+        """Iterates over the locations on the board, in the same order as iterating over the map itself.
+        Each call returns a new, independent iterator.
+
+        Args:
+            player_index: If 0 or 1, only locations on that player's half of the board
+            rows: If given, a [min_y, max_y] pair. Only locations with min_y <= y <= max_y
+            occupied_only: If True, skip locations that have no units
+            structures_only: If True, only locations that contain a structure
+
+        Returns:
+            An iterator of [x, y] locations
+
+        """
+        first_row, last_row = 0, self.ARENA_SIZE - 1
+        if player_index == 0:
+            last_row = self.HALF_ARENA - 1
+        elif player_index == 1:
+            first_row = self.HALF_ARENA
+        if rows is not None:
+            first_row = max(first_row, rows[0])
+            last_row = min(last_row, rows[1])
+        if first_row > last_row:
+            return iter(())
+        indexes = range(ROW_START[first_row], ROW_START[last_row + 1])
+        if structures_only:
+            structures = self.__structures
+            indexes = [index for index in indexes if structures[index] is not None]
+        elif occupied_only:
+            cells = self.__map
+            indexes = [index for index in indexes if cells[index]]
+        return ([CELL_LOCATIONS[index][0], CELL_LOCATIONS[index][1]] for index in indexes)
 
     def __empty_grid(self):
-        grid = []
-        for x in range(0, self.ARENA_SIZE):
-            grid.append([])
-            for _ in range(0, self.ARENA_SIZE):
-                grid[x].append([])
-        return grid
+        return [[] for _ in range(CELL_COUNT)]
+
+    def _set_cell(self, index, units):
+        """Replaces the list of units at a cell index and updates the structure arrays and unit indexes
+        """
+        if index in self.__unparsed:
+            self.__create_units(index)
+        if self._journal is not None:
+            self._journal.append((index, self.__map[index]))
+        self.__replace_cell(index, units)
+
+    def __replace_cell(self, index, units):
+        self._unindex_cell(index)
+        self.__map[index] = units
+        self._index_cell(index)
+
+    def _begin_journal(self):
+        """Starts recording changes to the map so they can be undone with _rollback_journal.
+        While recording, cell lists and units are replaced rather than modified.
+
+        Returns:
+            A savepoint to pass to _rollback_journal
+        """
+        if self._journal is None:
+            self._journal = []
+        return len(self._journal)
+
+    def _rollback_journal(self, savepoint):
+        """Undoes every change recorded since the given savepoint, in O(changes)
+        """
+        journal = self._journal
+        while len(journal) > savepoint:
+            index, units = journal.pop()
+            self.__replace_cell(index, units)
+
+    def _end_journal(self):
+        """Stops recording changes, keeping them
+        """
+        self._journal = None
+
+    def _append_unit(self, unit):
+        """Appends an existing GameUnit to the cell it is located at.
+        Used by GameState when parsing the serialized game state.
+        """
+        index = CELL_INDEX[unit.x * ARENA_SIZE + unit.y]
+        if index in self.__unparsed and not isinstance(unit, _UnparsedUnit):
+            self.__create_units(index)
+        if self._copy_on_write or self._journal is not None:
+            self._set_cell(index, self.__map[index] + [unit])
+        else:
+            list.append(self.__map[index], unit)
+            if not unit.stationary:
+                self._index_mobile(index, unit)
+            elif self.__structures[index] is None:
+                self._index_structure(index, unit)
+
+    def _append_unparsed_unit(self, unit_type, player_index, health, x, y):
+        """Adds a unit from the serialized game state without creating its GameUnit.
+        The map's arrays and indexes are updated straight away, and the GameUnits at a location are only created
+        when it is first read. Must not be mixed with GameUnits at the same location.
+        """
+        if self._copy_on_write or self._journal is not None:
+            self._append_unit(GameUnit(unit_type, self.config, player_index, health, x, y))
+            return
+        unit_information = self.__unit_information[unit_type]
+        if not health:
+            health = unit_information.get("startHealth", 0)
+        unit = _UnparsedUnit(unit_type, player_index, health, x, y, unit_information.get("unitCategory") == 0)
+        self._append_unit(unit)
+        self.__unparsed.add(CELL_INDEX[x * ARENA_SIZE + y])
+
+    def _peek_units(self, x, y):
+        """
+        Gets the units at a location without creating GameUnits for unparsed units. Only for use while parsing.
+        """
+        return self.__map[CELL_INDEX[x * ARENA_SIZE + y]]
+
+    def _peek_structure(self, x, y):
+        """
+        Gets the structure at a location without creating GameUnits for unparsed units. Only for use while parsing.
+        """
+        return self.__structures[CELL_INDEX[x * ARENA_SIZE + y]]
+
+    def __create_units(self, index):
+        """
+        Replaces the unparsed units at a cell index with GameUnits. The indexes already describe them.
+        """
+        self.__unparsed.discard(index)
+        structure = self.__structures[index]
+        units = []
+        for unparsed_unit in self.__map[index]:
+            unit = unparsed_unit.create_unit(self.config)
+            if unparsed_unit is structure:
+                self.__structures[index] = unit
+            units.append(unit)
+        self.__map[index] = units
+
+    def _upgrade_unit(self, unit):
+        """Upgrades a unit on the map and updates the structure arrays.
+        If the map shares its units with a fork or is recording changes, the unit is copied before being upgraded.
+
+        Returns:
+            The upgraded unit
+        """
+        index = CELL_INDEX[unit.x * ARENA_SIZE + unit.y]
+        if self._copy_on_write or self._journal is not None:
+            upgraded_unit = copy.copy(unit)
+            upgraded_unit.upgrade()
+            self._set_cell(index, [upgraded_unit if cell_unit is unit else cell_unit for cell_unit in self.__map[index]])
+            return upgraded_unit
+        if not unit.stationary:
+            self._unindex_mobile(index, unit)
+            unit.upgrade()
+            self._index_mobile(index, unit)
+            return unit
+        indexed = self.__structures[index] is unit
+        if indexed:
+            self._unindex_structure(index)
+        unit.upgrade()
+        if indexed:
+            self._index_structure(index, unit)
+        return unit
+
+    def fork(self):
+        """Creates a copy-on-write copy of this map.
+
+        The copy shares its config, unit lists and GameUnits with this map. Changes made through add_unit,
+        remove_unit, game_map[x, y] = units and GameState functions replace the affected lists and units
+        instead of modifying them, so neither map sees the other's changes. The copy gets its own list the first
+        time it reads a cell with game_map[x, y], so changing that list in place is also private to one map.
+        Changing a shared GameUnit directly will affect both maps.
+
+        Returns:
+            A new GameMap with the same units as this one
+
+        """
+        child = copy.copy(self)
+        child.__map = list(self.__map)
+        child.__unparsed = set(self.__unparsed)
+        child.__structures = list(self.__structures)
+        child.structure_type = list(self.structure_type)
+        child.structure_owner = list(self.structure_owner)
+        child.structure_health = list(self.structure_health)
+        child.structure_upgraded = list(self.structure_upgraded)
+        child.__structure_keys = list(self.__structure_keys)
+        child.__structure_bits = dict(self.__structure_bits)
+        self._copy_on_write = True
+        child._copy_on_write = True
+        self.__indexes_shared = True
+        child.__indexes_shared = True
+        child._journal = None
+        return child
+
+    def _index_cell(self, index):
+        for unit in self.__map[index]:
+            if not unit.stationary:
+                self._index_mobile(index, unit)
+            elif self.__structures[index] is None:
+                self._index_structure(index, unit)
+
+    def _unindex_cell(self, index):
+        self._unindex_structure(index)
+        for unit in self.__map[index]:
+            if not unit.stationary:
+                self._unindex_mobile(index, unit)
+
+    def __own_indexes(self):
+        """
+        Copies the unit indexes if they are shared with a fork, before they are modified.
+        """
+        if self.__indexes_shared:
+            self.__structure_index = {key: set(indexes) for key, indexes in self.__structure_index.items()}
+            self.__mobile_index = {key: dict(counts) for key, counts in self.__mobile_index.items()}
+            if self.__coverage is not None:
+                self.__coverage = tuple(tuple(list(values) for values in player_coverage) for player_coverage in self.__coverage)
+            self.__indexes_shared = False
+
+    def _index_structure(self, index, unit):
+        self.__own_indexes()
+        player_index, unit_type, upgraded = key = (unit.player_index, unit.unit_type, unit.upgraded)
+        structure_type = self.__type_index.get(unit_type, -1)
+        self.__structures[index] = unit
+        self.__structure_keys[index] = key
+        self.structure_type[index] = structure_type
+        self.structure_owner[index] = player_index
+        self.structure_health[index] = unit.health
+        self.structure_upgraded[index] = upgraded
+        self.zobrist_hash ^= zobrist_key(index, player_index, structure_type, upgraded)
+        self.blocked_hash ^= BLOCKED_KEYS[index]
+        bit = CELL_BITS[index]
+        self.blocked_bits |= bit
+        self.__structure_bits[key] = self.__structure_bits.get(key, 0) | bit
+        indexes = self.__structure_index.get(key)
+        if indexes is None:
+            indexes = self.__structure_index[key] = set()
+        indexes.add(index)
+        if self.__coverage is not None:
+            self.__update_coverage(index, unit, True)
+
+    def _unindex_structure(self, index):
+        if self.__structures[index] is None:
+            return
+        self.__own_indexes()
+        key = self.__structure_keys[index]
+        self.__structure_index[key].discard(index)
+        if self.__coverage is not None:
+            self.__update_coverage(index, self.__structures[index], False)
+        bit = CELL_BITS[index]
+        self.blocked_bits &= ~bit
+        self.__structure_bits[key] &= ~bit
+        self.zobrist_hash ^= zobrist_key(index, self.structure_owner[index], self.structure_type[index], self.structure_upgraded[index])
+        self.blocked_hash ^= BLOCKED_KEYS[index]
+        self.__structures[index] = None
+        self.__structure_keys[index] = None
+        self.structure_type[index] = -1
+        self.structure_owner[index] = -1
+        self.structure_health[index] = 0
+        self.structure_upgraded[index] = False
+
+    def _index_mobile(self, index, unit):
+        self.__own_indexes()
+        key = (unit.player_index, unit.unit_type, unit.upgraded)
+        counts = self.__mobile_index.get(key)
+        if counts is None:
+            counts = self.__mobile_index[key] = {}
+        counts[index] = counts.get(index, 0) + 1
+
+    def _unindex_mobile(self, index, unit):
+        counts = self.__mobile_index.get((unit.player_index, unit.unit_type, unit.upgraded))
+        if not counts or index not in counts:
+            return
+        self.__own_indexes()
+        counts = self.__mobile_index[(unit.player_index, unit.unit_type, unit.upgraded)]
+        if counts[index] > 1:
+            counts[index] -= 1
+        else:
+            del counts[index]
+
+    def __get_coverage(self):
+        """
+        Gets the attack coverage index, building it from the structures on the map the first time it is needed.
+        For each player, three per cell lists: the flat indexes (x * ARENA_SIZE + y) of that player's structures that
+        can attack the cell, in the order get_attackers returns them, and their summed damage to mobile units and
+        to structures. Kept up to date by _index_structure and _unindex_structure afterwards.
+        """
+        if self.__coverage is None:
+            for index in list(self.__unparsed):
+                if self.__structures[index] is not None:
+                    self.__create_units(index)
+            self.__coverage = tuple(([()] * CELL_COUNT, [0] * CELL_COUNT, [0] * CELL_COUNT) for _ in range(2))
+            for index, unit in enumerate(self.__structures):
+                if unit is not None:
+                    self.__update_coverage(index, unit, True)
+        return self.__coverage
+
+    def __update_coverage(self, index, unit, adding):
+        """
+        Adds or removes the cells a structure can attack from the coverage index.
+        """
+        if unit.player_index not in (0, 1) or unit.damage_i + unit.damage_f <= 0:
+            return
+        attackers, walker_damage, tower_damage = self.__coverage[unit.player_index]
+        structures = self.__structures
+        x, y = CELL_LOCATIONS[index]
+        flat = x * ARENA_SIZE + y
+        for dx, dy in coverage_stencil(unit.attackRange, self.__max_attack_range, self.__get_hit_radius):
+            new_x, new_y = x + dx, y + dy
+            if not (0 <= new_x < ARENA_SIZE and 0 <= new_y < ARENA_SIZE):
+                continue
+            cell = CELL_INDEX[new_x * ARENA_SIZE + new_y]
+            if cell < 0:
+                continue
+            if adding:
+                cell_attackers = tuple(sorted(attackers[cell] + (flat,)))
+            else:
+                cell_attackers = tuple(attacker for attacker in attackers[cell] if attacker != flat)
+            attackers[cell] = cell_attackers
+            walker_damage[cell] = sum(structures[CELL_INDEX[attacker]].damage_i for attacker in cell_attackers)
+            tower_damage[cell] = sum(structures[CELL_INDEX[attacker]].damage_f for attacker in cell_attackers)
+
+    def get_structure_attackers(self, location, player_index):
+        """Gets the structures that can attack a unit at a location, from an index maintained as structures
+        are added, upgraded and removed.
+
+        Args:
+            location: The location of a hypothetical defender, must be on the board
+            player_index: The index corresponding to the defending player, 0 for you 1 for the enemy
+
+        Returns:
+            A list of the other player's structures that can attack the location, in the order GameState.get_attackers returns them
+
+        """
+        x, y = location
+        if not self.in_arena_bounds(location) or type(x) is not int or type(y) is not int or player_index not in (0, 1):
+            self.warn("get_structure_attackers expects an integer location on the board and a player index of 0 or 1, got {} and {}".format(location, player_index))
+            return []
+        structures = self.__structures
+        return [structures[CELL_INDEX[attacker]] for attacker in self.__get_coverage()[1 - player_index][0][CELL_INDEX[x * ARENA_SIZE + y]]]
+
+    def get_attack_coverage(self, location, player_index):
+        """Gets how many of the other player's structures can attack a unit at a location, and how much damage they deal.
+        Constant time, from an index maintained as structures are added, upgraded and removed.
+
+        Args:
+            location: The location of a hypothetical defender, must be on the board
+            player_index: The index corresponding to the defending player, 0 for you 1 for the enemy
+
+        Returns:
+            A tuple (attackers, walker_damage, tower_damage) with the number of structures that can attack the location and the
+            summed damage per attack they deal to mobile units (attackDamageWalker) and to structures (attackDamageTower)
+
+        """
+        x, y = location
+        if not self.in_arena_bounds(location) or type(x) is not int or type(y) is not int or player_index not in (0, 1):
+            self.warn("get_attack_coverage expects an integer location on the board and a player index of 0 or 1, got {} and {}".format(location, player_index))
+            return (0, 0, 0)
+        attackers, walker_damage, tower_damage = self.__get_coverage()[1 - player_index]
+        cell = CELL_INDEX[x * ARENA_SIZE + y]
+        return (len(attackers[cell]), walker_damage[cell], tower_damage[cell])
+
+    def get_walker_damage_by_cell(self, player_index):
+        """Gets the damage per attack the other player's structures deal to a mobile unit of a player on every location
+
+        Args:
+            player_index: The index corresponding to the defending player, 0 for you 1 for the enemy
+
+        Returns:
+            A list of the summed attackDamageWalker on each location, indexed by CELL_INDEX[x * ARENA_SIZE + y]
+
+        """
+        return list(self.__get_coverage()[1 - player_index][1])
+
+    def _has_mobile_units(self, player_index):
+        """
+        Checks if a player has any mobile units on the map.
+        """
+        return any(counts for (key_player_index, _, _), counts in self.__mobile_index.items() if key_player_index == player_index)
+
+    def __matching_indexes(self, unit_index, player_index, unit_type, upgraded):
+        """
+        Yields the per-key entries of a unit index whose key matches the given filters.
+        """
+        for (key_player_index, key_unit_type, key_upgraded), entries in unit_index.items():
+            if (player_index is None or key_player_index == player_index) and \
+                    (unit_type is None or key_unit_type == unit_type) and \
+                    (upgraded is None or key_upgraded == upgraded):
+                yield entries
+
+    def get_structure_locations(self, player_index=None, unit_type=None, upgraded=None, rows=None):
+        """Gets the locations of structures matching the given filters.
+        Uses indexes kept up to date by add_unit, remove_unit and upgrades, so the cost depends
+        on the number of structures of the requested kind rather than the size of the board.
+
+        Args:
+            player_index: If given, only structures controlled by this player, 0 for you 1 for the enemy
+            unit_type: If given, only structures of this type, for example TURRET
+            upgraded: If given, only structures that are (True) or are not (False) upgraded
+            rows: If given, a [min_y, max_y] pair. Only structures with min_y <= y <= max_y
+
+        Returns:
+            A list of [x, y] locations, sorted in map iteration order
+
+        """
+        indexes = []
+        for entries in self.__matching_indexes(self.__structure_index, player_index, unit_type, upgraded):
+            indexes.extend(entries)
+        if rows is not None:
+            first, last = _row_cells(rows)
+            indexes = [index for index in indexes if first <= index < last]
+        indexes.sort()
+        return [[CELL_LOCATIONS[index][0], CELL_LOCATIONS[index][1]] for index in indexes]
+
+    def get_structure_bits(self, player_index=None, unit_type=None, upgraded=None):
+        """Gets a bitboard of the structures matching the given filters. See get_structure_locations.
+        Bitboards can be combined with the functions in this module, for example
+        expand_bits(game_map.get_structure_bits(1, WALL)) & HALF_BITS[0]
+
+        Returns:
+            An int with bit (x * ARENA_SIZE + y) set for every matching structure
+
+        """
+        bits = 0
+        for key, key_bits in self.__structure_bits.items():
+            if (player_index is None or key[0] == player_index) and \
+                    (unit_type is None or key[1] == unit_type) and \
+                    (upgraded is None or key[2] == upgraded):
+                bits |= key_bits
+        return bits
+
+    def get_mobile_unit_locations(self, player_index=None, unit_type=None, upgraded=None, rows=None):
+        """Gets the locations of mobile units matching the given filters. See get_structure_locations.
+
+        Returns:
+            A list of [x, y] locations with at least one matching mobile unit, sorted in map iteration order
+
+        """
+        indexes = set()
+        for entries in self.__matching_indexes(self.__mobile_index, player_index, unit_type, upgraded):
+            indexes.update(entries)
+        if rows is not None:
+            first, last = _row_cells(rows)
+            indexes = [index for index in indexes if first <= index < last]
+        return [[CELL_LOCATIONS[index][0], CELL_LOCATIONS[index][1]] for index in sorted(indexes)]
+
+    def count_units(self, player_index=None, unit_type=None, upgraded=None, rows=None):
+        """Counts the structures and mobile units matching the given filters. See get_structure_locations.
+
+        Returns:
+            The number of matching units
+
+        """
+        total = 0
+        first, last = 0, CELL_COUNT
+        if rows is not None:
+            first, last = _row_cells(rows)
+        for entries in self.__matching_indexes(self.__structure_index, player_index, unit_type, upgraded):
+            if rows is None:
+                total += len(entries)
+            else:
+                total += sum(1 for index in entries if first <= index < last)
+        for entries in self.__matching_indexes(self.__mobile_index, player_index, unit_type, upgraded):
+            total += sum(count for index, count in entries.items() if first <= index < last)
+        return total
 
     def _invalid_coordinates(self, location):
         self.warn("{} is out of bounds.".format(str(location)))
@@ -89,19 +1198,9 @@ class GameMap:
         
         """
         x, y = location
-        half_board = self.HALF_ARENA
-
-        row_size = y + 1
-        startx = half_board - row_size
-        endx = startx + (2 * row_size) - 1
-        top_half_check = (y < self.HALF_ARENA and x >= startx and x <= endx)
-
-        row_size = (self.ARENA_SIZE - 1 - y) + 1
-        startx = half_board - row_size
-        endx = startx + (2 * row_size) - 1
-        bottom_half_check = (y >= self.HALF_ARENA and x >= startx and x <= endx)
-
-        return bottom_half_check or top_half_check
+        if type(x) is int and type(y) is int:
+            return 0 <= x < ARENA_SIZE and 0 <= y < ARENA_SIZE and BOUNDS_MASK[x * ARENA_SIZE + y]
+        return _in_diamond(x, y)
 
     def get_edge_locations(self, quadrant_description):
         """Takes in an edge description and returns a list of locations.
@@ -117,8 +1216,7 @@ class GameMap:
             self.warn("Passed invalid quadrant_description '{}'. See the documentation for valid inputs for get_edge_locations.".format(quadrant_description))
             return
 
-        edges = self.get_edges()
-        return edges[quadrant_description]
+        return [[x, y] for x, y in EDGE_LOCATIONS[quadrant_description]]
 
     def get_edges(self):
         """Gets all of the edges and their edge locations
@@ -127,27 +1225,44 @@ class GameMap:
             A list with four lists inside of it of locations corresponding to the four edges.
             [0] = top_right, [1] = top_left, [2] = bottom_left, [3] = bottom_right.
         """
-        top_right = []
-        for num in range(0, self.HALF_ARENA):
-            x = self.HALF_ARENA + num
-            y = self.ARENA_SIZE - 1 - num
-            top_right.append([int(x), int(y)])
-        top_left = []
-        for num in range(0, self.HALF_ARENA):
-            x = self.HALF_ARENA - 1 - num
-            y = self.ARENA_SIZE - 1 - num
-            top_left.append([int(x), int(y)])
-        bottom_left = []
-        for num in range(0, self.HALF_ARENA):
-            x = self.HALF_ARENA - 1 - num
-            y = num
-            bottom_left.append([int(x), int(y)])
-        bottom_right = []
-        for num in range(0, self.HALF_ARENA):
-            x = self.HALF_ARENA + num
-            y = num
-            bottom_right.append([int(x), int(y)])
-        return [top_right, top_left, bottom_left, bottom_right]
+        return [[[x, y] for x, y in locations] for locations in EDGE_LOCATIONS]
+
+    def is_on_edge(self, location, quadrant_description):
+        """Checks if a location lies on the given edge
+
+        Args:
+            location: A map location
+            quadrant_description: A constant corresponding to one of the 4 edges. See game_map.TOP_LEFT, game_map.BOTTOM_RIGHT, and similar constants.
+
+        Returns:
+            True if the location is on that edge, False otherwise
+
+        """
+        return bool(edge_bits(location) & (1 << quadrant_description))
+
+    def is_friendly_spawn_edge(self, location):
+        """Checks if a location is on one of the edges you can deploy mobile units on
+
+        Args:
+            location: A map location
+
+        Returns:
+            True if the location is on the bottom left or bottom right edge, False otherwise
+
+        """
+        return bool(edge_bits(location) & FRIENDLY_EDGES_MASK)
+
+    def is_enemy_spawn_edge(self, location):
+        """Checks if a location is on one of the edges your opponent can deploy mobile units on
+
+        Args:
+            location: A map location
+
+        Returns:
+            True if the location is on the top left or top right edge, False otherwise
+
+        """
+        return bool(edge_bits(location) & ENEMY_EDGES_MASK)
     
     def add_unit(self, unit_type, location, player_index=0):
         """Add a single GameUnit to the map at the given location.
@@ -163,15 +1278,16 @@ class GameMap:
         """
         if not self.in_arena_bounds(location):
             self._invalid_coordinates(location)
+            return
         if player_index < 0 or player_index > 1:
             self.warn("Player index {} is invalid. Player index should be 0 or 1.".format(player_index))
 
         x, y = location
         new_unit = GameUnit(unit_type, self.config, player_index, None, location[0], location[1])
         if not new_unit.stationary:
-            self.__map[x][y].append(new_unit)
+            self._append_unit(new_unit)
         else:
-            self.__map[x][y] = [new_unit]
+            self._set_cell(CELL_INDEX[x * ARENA_SIZE + y], [new_unit])
 
     def remove_unit(self, location):
         """Remove all units on the map in the given location.
@@ -184,9 +1300,10 @@ class GameMap:
         """
         if not self.in_arena_bounds(location):
             self._invalid_coordinates(location)
-        
+            return
+
         x, y = location
-        self.__map[x][y] = []
+        self._set_cell(CELL_INDEX[x * ARENA_SIZE + y], [])
 
     def get_locations_in_range(self, location, radius):
         """Gets locations in a circular area around a location
@@ -205,9 +1322,12 @@ class GameMap:
             self._invalid_coordinates(location)
 
         x, y = location
+        if type(x) is int and type(y) is int:
+            return [[new_x, new_y] for new_x, new_y in locations_in_range(x, y, radius, self.__get_hit_radius)]
+
         locations = []
         search_radius = math.ceil(radius)
-        getHitRadius = self.config["unitInformation"][0]['getHitRadius']
+        getHitRadius = self.__get_hit_radius
         for i in range(int(x - search_radius), int(x + search_radius + 1)):
             for j in range(int(y - search_radius), int(y + search_radius + 1)):
                 new_location = [i, j]
@@ -216,6 +1336,35 @@ class GameMap:
                     locations.append(new_location)
         return locations
 
+    def get_locations_in_range_batch(self, locations, radius):
+        """Gets the locations in a circular area around each of several centers
+
+        Args:
+            locations: The centers of our search areas
+            radius: The radius of our search areas
+
+        Returns:
+            A list containing, for each center, the locations that are within its search area
+
+        """
+        if radius < 0 or radius > self.ARENA_SIZE:
+            self.warn("Radius {} was passed to get_locations_in_range_batch. Expected integer between 0 and {}".format(radius, self.ARENA_SIZE))
+        # The stencil and the cached results for this radius are looked up once for the whole batch
+        stencil = range_stencil(radius, self.__get_hit_radius)
+        by_center = _range_locations(radius, self.__get_hit_radius)
+        ranges = []
+        for location in locations:
+            x, y = location
+            if type(x) is not int or type(y) is not int or not (0 <= x < ARENA_SIZE and 0 <= y < ARENA_SIZE and BOUNDS_MASK[x * ARENA_SIZE + y]):
+                ranges.append(self.get_locations_in_range(location, radius))
+                continue
+            center = x * ARENA_SIZE + y
+            in_range = by_center.get(center)
+            if in_range is None:
+                in_range = by_center[center] = _scan_stencil(stencil, x, y)
+            ranges.append([[new_x, new_y] for new_x, new_y in in_range])
+        return ranges
+
     def distance_between_locations(self, location_1, location_2):
         """Euclidean distance
 
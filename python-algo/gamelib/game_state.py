@@ -1,11 +1,16 @@
+import copy
 import math
 import json
 import sys
+from bisect import bisect_left
+from itertools import accumulate
 
 from .navigation import ShortestPathFinder
-from .util import send_command, debug_write
+from .util import send_command, debug_write, parse_message
 from .unit import GameUnit
-from .game_map import GameMap
+from .unit_table import UnitTable
+from .wavefront import HAVE_NUMPY, np
+from .game_map import GameMap, ARENA_SIZE, BOARD_BITS, CELL_INDEX, locations_in_range, locations_to_bits, find_target
 
 def is_stationary(unit_type):
     """
@@ -44,20 +49,26 @@ class GameState:
         * my_time (int): The time you took to submit your previous turn
         * enemy_health (int): Your opponents current remaining health
         * enemy_time (int): Your opponents current remaining time
+        * min_numpy_paths (int): The fewest paths get_paths_damage_profile profiles with NumPy, when it is installed
 
     """
+    min_numpy_paths = 8
 
-    def __init__(self, config, serialized_string):
+    def __init__(self, config, serialized_string, lazy=False):
         """ Setup a turns variables using arguments passed
 
         Args:
             * config (JSON): A json object containing information about the game
-            * serialized_string (string): A string containing information about the game state at the start of this turn
+            * serialized_string (string): A string containing information about the game state at the start of this turn.
+              A GameMessage or an already parsed dict is used without being parsed again
+            * lazy (bool): Opt in to only creating the GameUnits at a location when it is first read. The map's
+              structure arrays and indexes are filled in straight away, so queries that use them never create units
 
         """
         self.serialized_string = serialized_string
         self.config = config
         self.enable_warnings = True
+        self._lazy = lazy
 
         global WALL, SUPPORT, TURRET, SCOUT, DEMOLISHER, INTERCEPTOR, REMOVE, UPGRADE, STRUCTURE_TYPES, ALL_UNITS, UNIT_TYPE_TO_INDEX
         UNIT_TYPE_TO_INDEX = {}
@@ -89,6 +100,12 @@ class GameState:
         MP = self.MP
         SP = self.SP
 
+        self._get_hit_radius = self.config["unitInformation"][0]['getHitRadius']
+        self._max_attack_range = 0
+        for unit in self.config["unitInformation"]:
+            if unit.get('attackRange', 0) >= self._max_attack_range:
+                self._max_attack_range = unit.get('attackRange', 0)
+
         self.game_map = GameMap(self.config)
         self._shortest_path_finder = ShortestPathFinder()
         self._build_stack = []
@@ -96,14 +113,94 @@ class GameState:
         self._player_resources = [
                 {'SP': 0, 'MP': 0},  # player 0, which is you
                 {'SP': 0, 'MP': 0}]  # player 1, which is the opponent
+        self._shares_turn_state = False
+        self._savepoints = []
+        self._resource_journal = []
         self.__parse_state(serialized_string)
 
+    def fork(self):
+        """Creates a cheap copy of this GameState to build hypothetical board states on.
+
+        The fork shares its config, map cells, GameUnits, resources and planned deployments with this GameState.
+        Anything changed through attempt_spawn, attempt_remove, attempt_upgrade or game_map.add_unit/remove_unit
+        is copied first, so changes to the fork never affect this GameState and vice versa.
+        Units should not be modified directly on either state.
+
+        Returns:
+            A new GameState representing the same turn
+
+        """
+        child = copy.copy(self)
+        child.game_map = self.game_map.fork()
+        self._shares_turn_state = True
+        child._shares_turn_state = True
+        child._savepoints = []
+        child._resource_journal = []
+        return child
+
+    def begin(self):
+        """Starts a transaction, or a nested savepoint if one is already in progress.
+
+        Until the matching rollback or commit, every change made by attempt_spawn, attempt_remove,
+        attempt_upgrade, game_map.add_unit and game_map.remove_unit is recorded, including resources
+        and the build and deploy stacks. Useful for trying placements during a depth first search
+        without copying the GameState.
+        """
+        self._savepoints.append((
+            self.game_map._begin_journal(),
+            len(self._resource_journal),
+            len(self._build_stack),
+            len(self._deploy_stack)))
+
+    def rollback(self):
+        """Undoes every change made since the matching call to begin, and ends that savepoint.
+        Costs time proportional to the number of changes undone.
+        """
+        if not self._savepoints:
+            self.warn("Called rollback without a matching call to begin")
+            return
+        map_savepoint, resource_savepoint, build_length, deploy_length = self._savepoints.pop()
+        self.__own_turn_state()
+        self.game_map._rollback_journal(map_savepoint)
+        journal = self._resource_journal
+        while len(journal) > resource_savepoint:
+            player_index, resource_key, amount = journal.pop()
+            self._player_resources[player_index][resource_key] = amount
+        del self._build_stack[build_length:]
+        del self._deploy_stack[deploy_length:]
+        if not self._savepoints:
+            self.game_map._end_journal()
+
+    def commit(self):
+        """Keeps every change made since the matching call to begin, and ends that savepoint.
+        Changes committed to a nested savepoint are still undone if an enclosing savepoint is rolled back.
+        """
+        if not self._savepoints:
+            self.warn("Called commit without a matching call to begin")
+            return
+        self._savepoints.pop()
+        if not self._savepoints:
+            self.game_map._end_journal()
+            self._resource_journal = []
+
+    def __own_turn_state(self):
+        """
+        Copies resources and the build and deploy stacks if they are shared with a fork, before they are modified.
+        """
+        if self._shares_turn_state:
+            self._player_resources = [dict(resources) for resources in self._player_resources]
+            self._build_stack = list(self._build_stack)
+            self._deploy_stack = list(self._deploy_stack)
+            self._shares_turn_state = False
+
     def __parse_state(self, state_line):
         """
         Fills in map based on the serialized game state so that self.game_map[x,y] is a list of GameUnits at that location.
-        state_line is the game state as a json string.
+        state_line is the game state as a json string, a GameMessage or a parsed dict.
         """
-        state = json.loads(state_line)
+        state = parse_message(state_line)
+        self._parsed_state = state
+        self._unit_table = None
 
         turn_info = state["turnInfo"]
         self.turn_number = int(turn_info[1])
@@ -130,6 +227,9 @@ class GameState:
         """
         Helper function for __parse_state to add units to the map.
         """
+        if self._lazy:
+            self.__create_unparsed_units(units, player_number)
+            return
         typedef = self.config.get("unitInformation")
         for i, unit_types in enumerate(units):
             for uinfo in unit_types:
@@ -144,10 +244,34 @@ class GameState:
                         self.game_map[x,y][0].pending_removal = True
                 elif unit_type == UPGRADE:
                     if self.contains_stationary_unit([x,y]):
-                        self.game_map[x,y][0].upgrade()
+                        self.game_map._upgrade_unit(self.game_map[x,y][0])
                 else:
                     unit = GameUnit(unit_type, self.config, player_number, hp, x, y)
-                    self.game_map[x,y].append(unit)
+                    self.game_map._append_unit(unit)
+
+    def __create_unparsed_units(self, units, player_number):
+        """
+        Helper function for __create_parsed_units that adds units to the map without creating GameUnits.
+        Removals and upgrades are recorded on the unit, and applied when its location is first read.
+        """
+        game_map = self.game_map
+        typedef = self.config.get("unitInformation")
+        for i, unit_types in enumerate(units):
+            unit_type = typedef[i].get("shorthand")
+            # This depends on RM and UP always being the last types to be processed
+            if unit_type == REMOVE or unit_type == UPGRADE:
+                for uinfo in unit_types:
+                    x, y = int(uinfo[0]), int(uinfo[1])
+                    if game_map._peek_structure(x, y) is None:
+                        continue
+                    unit = game_map._peek_units(x, y)[0]
+                    if unit_type == REMOVE:
+                        unit.pending_removal = True
+                    else:
+                        game_map._upgrade_unit(unit)
+            else:
+                for uinfo in unit_types:
+                    game_map._append_unparsed_unit(unit_type, player_number, float(uinfo[2]), int(uinfo[0]), int(uinfo[1]))
 
     def __resource_required(self, unit_type):
         return self.SP if is_stationary(unit_type) else self.MP
@@ -163,6 +287,9 @@ class GameState:
         elif resource_type == self.SP:
             resource_key = 'SP'
         held_resource = self.get_resource(resource_type, player_index)
+        self.__own_turn_state()
+        if self._savepoints:
+            self._resource_journal.append((player_index, resource_key, held_resource))
         self._player_resources[player_index][resource_key] = held_resource + amount
 
     def _invalid_player_index(self, index):
@@ -333,7 +460,7 @@ class GameState:
         stationary = is_stationary(unit_type)
         blocked = self.contains_stationary_unit(location) or (stationary and len(self.game_map[location[0],location[1]]) > 0)
         correct_territory = location[1] < self.HALF_ARENA
-        on_edge = location in (self.game_map.get_edge_locations(self.game_map.BOTTOM_LEFT) + self.game_map.get_edge_locations(self.game_map.BOTTOM_RIGHT))
+        on_edge = self.game_map.is_friendly_spawn_edge(location)
 
         if self.enable_warnings:
             fail_reason = ""
@@ -407,6 +534,7 @@ class GameState:
         for location in locations:
             if location[1] < self.HALF_ARENA and self.contains_stationary_unit(location):
                 x, y = map(int, location)
+                self.__own_turn_state()
                 self._build_stack.append((REMOVE, x, y))
                 removed_units += 1
             else:
@@ -445,7 +573,7 @@ class GameState:
                     if resources[SP] >= costs[SP] and resources[MP] >= costs[MP]:
                         self.__set_resource(SP, 0 - costs[SP])
                         self.__set_resource(MP, 0 - costs[MP])
-                        existing_unit.upgrade()
+                        self.game_map._upgrade_unit(existing_unit)
                         self._build_stack.append((UPGRADE, x, y))
                         spawned_units += 1
             else:
@@ -475,20 +603,26 @@ class GameState:
         elif right and top:
             return self.game_map.BOTTOM_LEFT
 
-    def find_path_to_edge(self, start_location, target_edge=None):
+    def find_path_to_edge(self, start_location, target_edge=None, extra_blocked=None, unblocked=None):
         """Gets the path a unit at a given location would take. 
         If final point is not on an edge, it is a self destruct path
 
+        extra_blocked and unblocked overlay hypothetical changes on the current structures, for example walls we
+        are considering and a turret we expect to die, without changing the game map.
+
         Args:
             start_location: The location of a hypothetical unit
             target_edge: The edge the unit wants to reach. game_map.TOP_LEFT, game_map.BOTTOM_RIGHT, etc. Induced from start_location if None.
+            extra_blocked: Locations to treat as blocked, as a list of locations or a bitboard
+            unblocked: Locations to treat as empty, as a list of locations or a bitboard. Takes priority over extra_blocked
 
         Returns:
             A list of locations corresponding to the path the unit would take 
             to get from it's starting location to the best available end location
 
         """
-        if self.contains_stationary_unit(start_location):
+        blocked_bits = self._overlay_blocked_bits(extra_blocked, unblocked)
+        if self._is_blocked_start(start_location, blocked_bits):
             self.warn("Attempted to perform pathing from blocked starting location {}".format(start_location))
             return
 
@@ -496,7 +630,108 @@ class GameState:
             target_edge = self.get_target_edge(start_location)
 
         end_points = self.game_map.get_edge_locations(target_edge)
-        return self._shortest_path_finder.navigate_multiple_endpoints(start_location, end_points, self)
+        return self._shortest_path_finder.navigate_multiple_endpoints(start_location, end_points, self, blocked_bits)
+
+    def _overlay_blocked_bits(self, extra_blocked, unblocked):
+        """Gets the bitboard of blocked locations with an overlay applied, or None if there is no overlay
+        """
+        if extra_blocked is None and unblocked is None:
+            return None
+        blocked_bits = self.game_map.blocked_bits
+        if extra_blocked is not None:
+            blocked_bits |= (extra_blocked if isinstance(extra_blocked, int) else locations_to_bits(extra_blocked)) & BOARD_BITS
+        if unblocked is not None:
+            blocked_bits &= ~(unblocked if isinstance(unblocked, int) else locations_to_bits(unblocked))
+        return blocked_bits
+
+    def _is_blocked_start(self, start_location, blocked_bits):
+        """Checks if a path start is blocked, by a structure or by the overlay blocked_bits if it is not None
+        """
+        if blocked_bits is None:
+            return self.contains_stationary_unit(start_location)
+        if not self.game_map.in_arena_bounds(start_location):
+            self.warn('Checked for stationary unit outside of arena bounds')
+            return False
+        return bool((blocked_bits >> (int(start_location[0]) * self.ARENA_SIZE + int(start_location[1]))) & 1)
+
+    def can_reach_edge(self, start_location, target_edge=None):
+        """Checks whether a unit at a given location can reach its target edge, or will self destruct instead.
+        Cheap once the current layout has been searched, as reachability is cached per structure layout.
+
+        Args:
+            start_location: The location of a hypothetical unit
+            target_edge: The edge the unit wants to reach. game_map.TOP_LEFT, game_map.BOTTOM_RIGHT, etc. Induced from start_location if None.
+
+        Returns:
+            True if the unit can reach the edge, False if it would self destruct or start_location is blocked
+
+        """
+        if target_edge is None:
+            target_edge = self.get_target_edge(start_location)
+
+        end_points = self.game_map.get_edge_locations(target_edge)
+        return self._shortest_path_finder.can_reach_endpoints(start_location, end_points, self)
+
+    def find_paths_to_edge_batch(self, start_locations, target_edge=None, extra_blocked=None, unblocked=None):
+        """Gets the paths units at several locations would take, sharing the work between them.
+        This is much cheaper than calling find_path_to_edge for each location, for example to evaluate every spawn location.
+
+        Args:
+            start_locations: A list of locations of hypothetical units
+            target_edge: The edge the units want to reach. game_map.TOP_LEFT, game_map.BOTTOM_RIGHT, etc. Induced from each start location if None.
+            extra_blocked: Locations to treat as blocked, as a list of locations or a bitboard
+            unblocked: Locations to treat as empty, as a list of locations or a bitboard. Takes priority over extra_blocked
+
+        Returns:
+            A list with the path from each start location, in the same order, as find_path_to_edge would return it.
+            Blocked start locations get None.
+
+        """
+        blocked_bits = self._overlay_blocked_bits(extra_blocked, unblocked)
+        starts_by_edge = {}
+        for index, start_location in enumerate(start_locations):
+            if self._is_blocked_start(start_location, blocked_bits):
+                self.warn("Attempted to perform pathing from blocked starting location {}".format(start_location))
+                continue
+            edge = self.get_target_edge(start_location) if target_edge is None else target_edge
+            starts_by_edge.setdefault(edge, []).append(index)
+
+        paths = [None] * len(start_locations)
+        for edge, indexes in starts_by_edge.items():
+            end_points = self.game_map.get_edge_locations(edge)
+            edge_paths = self._shortest_path_finder.navigate_multiple_endpoints_batch([start_locations[index] for index in indexes], end_points, self, blocked_bits)
+            for index, path in zip(indexes, edge_paths):
+                paths[index] = path
+        return paths
+
+    def find_path_to_edge_layouts(self, start_location, blocked_layouts, target_edge=None):
+        """Gets the path a unit at a given location would take on each of several hypothetical layouts,
+        without changing the game map. Uses NumPy to solve large batches together when it is installed.
+
+        Args:
+            start_location: The location of a hypothetical unit
+            blocked_layouts: A list of bitboards of blocked locations, for example game_map.blocked_bits | locations_to_bits(walls)
+            target_edge: The edge the unit wants to reach. game_map.TOP_LEFT, game_map.BOTTOM_RIGHT, etc. Induced from start_location if None.
+
+        Returns:
+            A list with the path for each layout, in the same order. Layouts that block start_location get None.
+
+        """
+        if target_edge is None:
+            target_edge = self.get_target_edge(start_location)
+
+        end_points = self.game_map.get_edge_locations(target_edge)
+        return self._shortest_path_finder.navigate_multiple_layouts(start_location, end_points, blocked_layouts, self)
+
+    def get_path_cache_info(self):
+        """Gets statistics about the cache of found paths. Paths are cached by the set of blocked locations,
+        so placing or removing structures never returns a stale path.
+
+        Returns:
+            A dict with the number of cache hits and misses, the number of cached paths and the maximum size
+
+        """
+        return self._shortest_path_finder.get_path_cache_info()
 
     def contains_stationary_unit(self, location):
         """Check if a location is blocked, return structures unit if it is
@@ -511,11 +746,78 @@ class GameState:
         if not self.game_map.in_arena_bounds(location):
             self.warn('Checked for stationary unit outside of arena bounds')
             return False
-        x, y = map(int, location)
-        for unit in self.game_map[x,y]:
-            if unit.stationary:
-                return unit
-        return False
+        structure = self.game_map.structure_at(int(location[0]), int(location[1]))
+        if structure is None:
+            return False
+        return structure
+
+    def get_serialized_board(self):
+        """Serializes the board, resources and health in the game engine's format, without the events or unit ids.
+        Unlike serialized_string, it includes changes made to this GameState, like units spawned with attempt_spawn.
+        A GameState created from it has the same units, which makes it a compact way to send a board to other processes.
+
+        Returns:
+            A dict that can be passed to GameState in place of a serialized string
+
+        """
+        typedef = self.config["unitInformation"]
+        type_indexes = {unit_information.get("shorthand"): index for index, unit_information in enumerate(typedef)}
+        units = [[[] for _ in typedef], [[] for _ in typedef]]
+        for x, y in self.game_map.iter_locations(occupied_only=True):
+            for unit in self.game_map[x, y]:
+                if unit.player_index not in (0, 1):
+                    continue
+                player_units = units[unit.player_index]
+                player_units[type_indexes[unit.unit_type]].append([x, y, unit.health, ""])
+                # Removals and upgrades apply to the structure at a location, as in the engine's format
+                if unit.stationary and unit.pending_removal:
+                    player_units[UNIT_TYPE_TO_INDEX[REMOVE]].append([x, y, 0, ""])
+                if unit.stationary and unit.upgraded:
+                    player_units[UNIT_TYPE_TO_INDEX[UPGRADE]].append([x, y, 0, ""])
+        return {
+            "turnInfo": [0, self.turn_number, -1],
+            "p1Stats": [self.my_health, self._player_resources[0]['SP'], self._player_resources[0]['MP'], self.my_time],
+            "p2Stats": [self.enemy_health, self._player_resources[1]['SP'], self._player_resources[1]['MP'], self.enemy_time],
+            "p1Units": units[0],
+            "p2Units": units[1],
+            "events": {},
+        }
+
+    def get_unit_table(self):
+        """Gets the units of the game state this GameState was created from as columns, for queries over many
+        units that do not create GameUnits. Built on first use from the parsed p1Units and p2Units.
+
+        The table is a snapshot of the turn's state. Units spawned, removed or upgraded on this GameState
+        afterwards, with attempt_spawn, attempt_remove, attempt_upgrade or game_map.add_unit and remove_unit,
+        are not in it. UnitTable(game_state.config, game_state.get_serialized_board()) builds a table of the
+        board as it is now.
+
+        Returns:
+            A UnitTable
+
+        """
+        if self._unit_table is None:
+            self._unit_table = UnitTable(self.config, self._parsed_state)
+        return self._unit_table
+
+    def get_board_hash(self):
+        """Gets a hash of the structures on the board, useful as a key for caching results across hypothetical boards.
+        Two boards with the same structures, owners and upgrades have the same hash, however they were reached.
+
+        Returns:
+            A 64 bit int, maintained incrementally by the game map
+
+        """
+        return self.game_map.zobrist_hash
+
+    def get_blocked_hash(self):
+        """Gets a hash of the set of blocked locations, which is all that matters for pathing.
+
+        Returns:
+            A 64 bit int, maintained incrementally by the game map
+
+        """
+        return self.game_map.blocked_hash
 
     def warn(self, message):
         """ Used internally by game_state to print warnings
@@ -555,7 +857,7 @@ class GameState:
             return
 
         attacker_location = [attacking_unit.x, attacking_unit.y]
-        possible_locations = self.game_map.get_locations_in_range(attacker_location, attacking_unit.attackRange)
+        possible_locations = self.__locations_in_range(attacker_location, attacking_unit.attackRange)
         target = None
         target_stationary = True
         target_distance = sys.maxsize
@@ -614,6 +916,54 @@ class GameState:
                     target_x_distance = unit_x_distance
         return target
 
+    def get_targets(self, attackers):
+        """Finds the targets of many units at once, for example every unit on the board during a frame.
+        Gives the same result as calling get_target for each of them, but the units on the map are only
+        grouped by owner and location once. Each attacker then either checks the few enemy locations that are
+        occupied, or searches outwards from its own location and stops at the nearest distance that has a target.
+
+        Args:
+            attackers: A list of GameUnits
+
+        Returns:
+            A list with the GameUnit each attacker would choose to attack, or None if it has no target
+
+        """
+        index = self.__target_index()
+        targets = []
+        for attacking_unit in attackers:
+            if index is None or not isinstance(attacking_unit, GameUnit) or attacking_unit.player_index not in (0, 1) \
+                    or type(attacking_unit.x) is not int or type(attacking_unit.y) is not int:
+                targets.append(self.get_target(attacking_unit))
+            else:
+                targets.append(find_target(attacking_unit.x, attacking_unit.y, attacking_unit.player_index, attacking_unit.attackRange,
+                    attacking_unit.damage_i, attacking_unit.damage_f, index[1 - attacking_unit.player_index], self._get_hit_radius))
+        return targets
+
+    def __target_index(self):
+        """
+        Groups the units on the map for get_targets as index[player_index][stationary][flat index] = list of units,
+        keeping the order of each cell. Returns None if a unit is not owned by either player.
+        """
+        index = (({}, {}), ({}, {}))
+        game_map = self.game_map
+        for x, y in game_map.iter_locations(occupied_only=True):
+            flat = x * ARENA_SIZE + y
+            for unit in game_map[x, y]:
+                if unit.player_index not in (0, 1):
+                    return None
+                index[unit.player_index][unit.stationary].setdefault(flat, []).append(unit)
+        return index
+
+    def __locations_in_range(self, location, radius):
+        """
+        Like game_map.get_locations_in_range, but returns the cached location tuples for integer locations.
+        """
+        x, y = location
+        if type(x) is int and type(y) is int:
+            return locations_in_range(x, y, radius, self._get_hit_radius)
+        return self.game_map.get_locations_in_range(location, radius)
+
     def get_attackers(self, location, player_index):
         """Gets the stationary units threatening a given location
 
@@ -628,6 +978,10 @@ class GameState:
 
         if not player_index == 0 and not player_index == 1:
             self._invalid_player_index(player_index)
+        elif self.game_map.in_arena_bounds(location) and type(location[0]) is int and type(location[1]) is int \
+                and not self.game_map._has_mobile_units(1 - player_index):
+            # Only structures can attack, and the map indexes which structures cover each location
+            return self.game_map.get_structure_attackers(location, player_index)
         if not self.game_map.in_arena_bounds(location):
             self.warn("Location {} is not in the arena bounds.".format(location))
 
@@ -635,13 +989,124 @@ class GameState:
         """
         Get locations in the range of TURRET units
         """
-        max_range = 0
-        for unit in self.config["unitInformation"]:
-            if unit.get('attackRange', 0) >= max_range:
-                max_range = unit.get('attackRange', 0)
-        possible_locations= self.game_map.get_locations_in_range(location, max_range)
+        possible_locations = self.__locations_in_range(location, self._max_attack_range)
         for location_unit in possible_locations:
             for unit in self.game_map[location_unit]:
                 if unit.damage_i + unit.damage_f > 0 and unit.player_index != player_index and self.game_map.distance_between_locations(location, location_unit) <= unit.attackRange:
                     attackers.append(unit)
         return attackers
+
+    def get_path_damage_profile(self, path, player_index=0, unit_types=None):
+        """Estimates the damage mobile units following a path would take from the other player's structures.
+
+        A unit with a speed of s spends 1 / s frames on each location of its path, and every structure that can
+        attack a location hits the unit once per frame for its attackDamageWalker, including upgrades. Shielding,
+        and the damage being shared between several units, are not taken into account.
+
+        Args:
+            path: A list of locations, for example from find_path_to_edge
+            player_index: The player controlling the moving units, 0 for you 1 for the enemy
+            unit_types: A list of mobile unit types to profile, every mobile unit type if None
+
+        Returns:
+            A dict from each unit type to a dict with:
+                * damage_per_frame (list): The damage taken on each frame the unit spends on the path
+                * total_damage (float): The damage taken over the whole path
+                * destroyed_frame (int): The first frame a single unit's startHealth has run out by, or None if it survives
+
+        """
+        return self.get_paths_damage_profile([path], player_index, unit_types)[0]
+
+    def get_paths_damage_profile(self, paths, player_index=0, unit_types=None, use_numpy=None):
+        """Estimates the damage mobile units following each of several paths would take. See get_path_damage_profile.
+
+        The damage on every location is read from the map's coverage index once, then each path is worked out as
+        arrays: the damage on each of its locations, repeated once per frame spent there, and its running total,
+        which gives destroyed_frame. With NumPy installed, large batches are padded into one array per unit type and
+        computed together. Both give the same results.
+
+        Args:
+            paths: A list of paths, for example from find_paths_to_edge_batch. None entries are skipped
+            player_index: The player controlling the moving units, 0 for you 1 for the enemy
+            unit_types: A list of mobile unit types to profile, every mobile unit type if None
+            use_numpy: Whether to use NumPy, decided by min_numpy_paths and whether it is installed if None
+
+        Returns:
+            A list with the profile of each path as get_path_damage_profile returns it, or None where the path was None
+
+        """
+        if not player_index == 0 and not player_index == 1:
+            self._invalid_player_index(player_index)
+            return [None] * len(paths)
+        if unit_types is None:
+            unit_types = [SCOUT, DEMOLISHER, INTERCEPTOR]
+        unit_frames = []
+        for unit_type in unit_types:
+            unit_def = self.config["unitInformation"][UNIT_TYPE_TO_INDEX[unit_type]]
+            speed = unit_def.get('speed', 0)
+            if is_stationary(unit_type) or speed <= 0:
+                self._invalid_unit(unit_type)
+                continue
+            unit_frames.append((unit_type, max(1, int(round(1 / speed))), unit_def.get('startHealth', 0)))
+
+        # Locations off the board get cell -1, the extra 0 at the end of the damage list
+        damage_by_cell = self.game_map.get_walker_damage_by_cell(player_index) + [0]
+        path_cells = [None if path is None else [CELL_INDEX[x * ARENA_SIZE + y] if 0 <= x < ARENA_SIZE and 0 <= y < ARENA_SIZE else -1
+            for x, y in path] for path in paths]
+        batch = [cells for cells in path_cells if cells is not None]
+        if use_numpy is None:
+            use_numpy = HAVE_NUMPY and len(batch) >= self.min_numpy_paths
+        if use_numpy and not HAVE_NUMPY:
+            debug_write("get_paths_damage_profile requires NumPy to use_numpy, falling back to pure Python")
+            use_numpy = False
+        if use_numpy and batch and any(batch):
+            batch_profiles = iter(self.__damage_profiles_numpy(batch, damage_by_cell, unit_frames))
+        else:
+            batch_profiles = (self.__damage_profile(cells, damage_by_cell, unit_frames) for cells in batch)
+        return [None if cells is None else next(batch_profiles) for cells in path_cells]
+
+    def __damage_profile(self, cells, damage_by_cell, unit_frames):
+        """
+        Works out the damage profile of one path, given as cell indexes, for each (unit_type, frames per location, health).
+        """
+        location_damage = [damage_by_cell[cell] for cell in cells]
+        profile = {}
+        for unit_type, frames_per_location, health in unit_frames:
+            if frames_per_location == 1:
+                damage_per_frame = list(location_damage)
+            else:
+                damage_per_frame = [damage for damage in location_damage for _ in range(frames_per_location)]
+            running_damage = list(accumulate(damage_per_frame))
+            # Damage is never negative, so the running total is sorted
+            destroyed_frame = bisect_left(running_damage, health)
+            profile[unit_type] = {
+                "damage_per_frame": damage_per_frame,
+                "total_damage": running_damage[-1] if running_damage else 0,
+                "destroyed_frame": destroyed_frame if destroyed_frame < len(running_damage) else None}
+        return profile
+
+    def __damage_profiles_numpy(self, batch, damage_by_cell, unit_frames):
+        """
+        Works out the damage profiles of a batch of paths with NumPy, padding every path with damage free
+        locations to the length of the longest.
+        """
+        lengths = np.array([len(cells) for cells in batch], dtype=np.int64)
+        padded = np.arange(lengths.max()) < lengths[:, None]
+        grid = np.full(padded.shape, -1, dtype=np.int64)
+        grid[padded] = np.fromiter((cell for cells in batch for cell in cells), dtype=np.int64, count=int(lengths.sum()))
+        location_damage = np.array(damage_by_cell, dtype=np.float64)[grid]
+        profiles = [{} for _ in batch]
+        for unit_type, frames_per_location, health in unit_frames:
+            frame_damage = np.repeat(location_damage, frames_per_location, axis=1)
+            running_damage = np.cumsum(frame_damage, axis=1)
+            destroyed = running_damage >= health
+            destroyed_frames = np.where(destroyed.any(axis=1), destroyed.argmax(axis=1), -1).tolist()
+            total_damage = running_damage[:, -1].tolist()
+            frames = (lengths * frames_per_location).tolist()
+            for row, profile in enumerate(profiles):
+                destroyed_frame = destroyed_frames[row]
+                profile[unit_type] = {
+                    "damage_per_frame": frame_damage[row, :frames[row]].tolist(),
+                    "total_damage": total_damage[row],
+                    "destroyed_frame": destroyed_frame if 0 <= destroyed_frame < frames[row] else None}
+        return profiles
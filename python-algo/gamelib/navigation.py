@@ -1,24 +1,60 @@
-import heapq
-import math
 import sys
-import queue
+import heapq
+from collections import OrderedDict
 from .util import debug_write
+from .game_map import ARENA_SIZE, HALF_ARENA, BOUNDS_MASK, EDGE_LOCATIONS, EDGE_SETS, edge_location_set, popcount
+from .wavefront import HAVE_NUMPY, np, bits_to_grids, distance_fields, reached_grids
 
-class Node:
-    """A path-finding node
+"""
+Precomputed tables used by the path finder. Locations are addressed by their flat index,
+x * ARENA_SIZE + y, the same index used by BOUNDS_MASK and the GameMap bitboards.
 
-    Attributes :
-        * visited_idealness (bool): Have we visited this node during the idealness search step?
-        * visited_validate (bool): Have we visited this node during the validation step?
-        * blocked (bool): Is there a structures at this node's location
-        * pathlength: The distance between this node and the target location
+    * _FLAT_X, _FLAT_Y: The x and y coordinate of each flat index
+    * _NEIGHBORS: For each flat index on the board, the flat indexes of its on-board neighbors,
+      in the same order as _get_neighbors
+    * _IDEALNESS: For each direction key (see _direction_key), the idealness of each flat index
+"""
+_FLAT_SIZE = ARENA_SIZE * ARENA_SIZE
+_FLAT_X = tuple(flat // ARENA_SIZE for flat in range(_FLAT_SIZE))
+_FLAT_Y = tuple(flat % ARENA_SIZE for flat in range(_FLAT_SIZE))
+
+
+def _on_board_neighbors(flat):
+    if not BOUNDS_MASK[flat]:
+        return ()
+    x, y = _FLAT_X[flat], _FLAT_Y[flat]
+    neighbors = []
+    for new_x, new_y in ((x, y + 1), (x, y - 1), (x + 1, y), (x - 1, y)):
+        if 0 <= new_x < ARENA_SIZE and 0 <= new_y < ARENA_SIZE and BOUNDS_MASK[new_x * ARENA_SIZE + new_y]:
+            neighbors.append(new_x * ARENA_SIZE + new_y)
+    return tuple(neighbors)
+
+_NEIGHBORS = tuple(_on_board_neighbors(flat) for flat in range(_FLAT_SIZE))
+
+
+def _direction_key(direction):
+    """Packs a direction from _get_direction_from_endpoints into an int, bit 0 set for +x and bit 1 set for +y"""
+    return (1 if direction[0] == 1 else 0) + (2 if direction[1] == 1 else 0)
+
+
+def _idealness_table(direction_key):
+    table = []
+    for flat in range(_FLAT_SIZE):
+        x, y = _FLAT_X[flat], _FLAT_Y[flat]
+        idealness = 28 * y if direction_key & 2 else 28 * (27 - y)
+        idealness += x if direction_key & 1 else (27 - x)
+        table.append(idealness)
+    return tuple(table)
+
+_IDEALNESS = tuple(_idealness_table(direction_key) for direction_key in range(4))
+_EDGE_FLATS = tuple(tuple(x * ARENA_SIZE + y for x, y in locations) for locations in EDGE_LOCATIONS)
+_EDGE_FLAT_SETS = tuple(frozenset(flats) for flats in _EDGE_FLATS)
+_EDGE_BY_FLAT_SET = {flat_set: edge for edge, flat_set in enumerate(_EDGE_FLAT_SETS)}
+_EDGE_DIRECTION_KEYS = tuple((1 if x >= HALF_ARENA else 0) + (2 if y >= HALF_ARENA else 0) for (x, y), *_ in EDGE_LOCATIONS)
+_UNREACHED = [-1] * _FLAT_SIZE
+if HAVE_NUMPY:
+    _IDEALNESS_GRIDS = np.array(_IDEALNESS, dtype=np.int32).reshape(4, ARENA_SIZE, ARENA_SIZE)
 
-    """
-    def __init__(self):
-        self.visited_idealness = False
-        self.visited_validate = False
-        self.blocked = False
-        self.pathlength = -1
 
 """
 This class helps with pathfinding. We guarantee the results will
@@ -28,86 +64,720 @@ code to maximise time efficiency
 class ShortestPathFinder:
     """Handles path-finding
 
+    The path finder keeps flat working arrays between calls instead of building a grid of nodes for every
+    search. Each idealness search increments a generation counter and treats entries stamped with an older
+    generation as unvisited, so nothing has to be cleared. The blocked array is synced from the game map's blocked
+    bitboard, touching only the locations that changed since the previous search.
+
+    Found paths are cached by the exact set of blocked locations, the start and the endpoints. Placing or
+    removing a structure changes the blocked set, so stale paths are never returned and no explicit
+    invalidation is needed. The least recently used paths are evicted past path_cache_size entries. After a
+    cache hit the search is only rerun if the working arrays are inspected, for example by print_map.
+
+    The distance field from each validation source, an edge or the ideal tile of a closed pocket, is kept
+    along with the blocked layout it was computed for. When the layout has changed by at most
+    max_field_repairs locations, the field is repaired around those locations instead of searched again.
+    Distances lost by blocking a location are recomputed only for the locations that depended on it, and
+    distances shortened by unblocking a location are relaxed outwards from it. The result is identical to
+    a full search.
+
+    For the four edges, the idealness search is replaced by connected component labels cached per blocked
+    layout once a layout is searched a second time. The first search from a pocket labels the whole pocket and
+    records its most ideal tile towards each edge, so later searches from anywhere in that pocket only look
+    the tile up.
+
     Attributes :
         * HORIZONTAL (int): A constant representing a horizontal movement
         * VERTICAL (int): A constant representing a vertical movement
 
         * game_state (:obj: GameState): The current gamestate
-        * game_map (:obj: GameMap): The current gamemap
+        * path_cache_size (int): The maximum number of cached paths, 0 disables the cache
+        * path_cache_hits (int): The number of paths served from the cache
+        * path_cache_misses (int): The number of paths that had to be searched
+        * max_field_repairs (int): The most changed locations to repair a distance field for, 0 always searches again
+        * min_numpy_layouts (int): The fewest layouts navigate_multiple_layouts solves with NumPy, when it is installed
 
     """
-    def __init__(self):
+    def __init__(self, path_cache_size=4096, field_cache_size=64, max_field_repairs=8, component_cache_size=64):
         self.HORIZONTAL = 1
         self.VERTICAL = 2
         self.initialized = False
-
-    def initialize_map(self, game_state):
+        self.game_state = None
+        self.__end_points = None
+        self.__end_point_set = frozenset()
+        self.__blocked = bytearray(_FLAT_SIZE)
+        self.__blocked_bits = 0
+        self.__field = _UNREACHED
+        self.__fields = OrderedDict()
+        self.__components = OrderedDict()
+        self.__idealness_stamp = [0] * _FLAT_SIZE
+        self.__pocket = [0] * _FLAT_SIZE
+        self.__generation = 0
+        self.__queue = [0] * _FLAT_SIZE
+        self.__path_cache = OrderedDict()
+        self.__skipped_search = None
+        self.path_cache_size = path_cache_size
+        self.path_cache_hits = 0
+        self.path_cache_misses = 0
+        self.field_cache_size = field_cache_size
+        self.max_field_repairs = max_field_repairs
+        self.min_numpy_layouts = 16
+        self.component_cache_size = component_cache_size
+
+    def initialize_map(self, game_state, blocked_bits=None):
         """Initializes the map
 
         Args:
             game_state: A GameState object representing the gamestate we want to traverse
+            blocked_bits: A bitboard of blocked locations to use instead of the game map's structures
         """
-        #Initialize map 
         self.initialized = True
         self.game_state = game_state
-        self.game_map = [[Node() for x in range(self.game_state.ARENA_SIZE)] for y in range(self.game_state.ARENA_SIZE)]
+        self.__skipped_search = None
+        self._set_blocked_bits(game_state.game_map.blocked_bits if blocked_bits is None else blocked_bits)
+        self.__generation += 1
 
-    def navigate_multiple_endpoints(self, start_point, end_points, game_state):
+    def _set_blocked_bits(self, blocked_bits):
+        """Updates the blocked array to match a bitboard, touching only the locations that changed
+        """
+        changed = blocked_bits ^ self.__blocked_bits
+        blocked = self.__blocked
+        while changed:
+            lowest = changed & -changed
+            blocked[lowest.bit_length() - 1] ^= 1
+            changed ^= lowest
+        self.__blocked_bits = blocked_bits
+
+    def navigate_multiple_endpoints(self, start_point, end_points, game_state, blocked_bits=None):
         """Finds the path a unit would take to reach a set of endpoints
 
         Args:
             * start_point: The starting location of the unit
             * end_points: The end points of the unit, should be a list of edge locations
             * game_state: The current game state
+            * blocked_bits: A bitboard of blocked locations to path around instead of the game map's structures
 
         Returns:
             The path a unit at start_point would take when trying to reach end_points given the current game state.
             Note that this path can change if a tower is destroyed during pathing, or if you or your enemy places structures.
 
         """
-        if game_state.contains_stationary_unit(start_point):
+        if blocked_bits is None:
+            if game_state.contains_stationary_unit(start_point) or not game_state.game_map.in_arena_bounds(start_point):
+                return
+            blocked_bits = game_state.game_map.blocked_bits
+        elif not game_state.game_map.in_arena_bounds(start_point) or (blocked_bits >> (int(start_point[0]) * ARENA_SIZE + int(start_point[1]))) & 1:
+            return
+
+        start = int(start_point[0]) * ARENA_SIZE + int(start_point[1])
+        end_flats, end_set = self._get_end_point_flats(end_points)
+        cache_key = (blocked_bits, start, end_set)
+        path = self._get_cached_path(cache_key, start_point)
+        if path is not None:
+            self.__skipped_search = (start_point, end_points, game_state, blocked_bits)
+            return path
+
+        self.initialize_map(game_state, blocked_bits)
+        direction_key = _direction_key(self._get_direction_from_endpoints(end_points))
+        ideal_tile = self._ideal_tile_flat(start, end_flats, end_set, direction_key)
+        self._validate_flat(ideal_tile, end_flats, end_set)
+        path = self._get_path_flat(start_point, start, direction_key)
+        self._cache_path(cache_key, path)
+        return path
+
+    def _get_cached_path(self, cache_key, start_point):
+        """Gets a fresh copy of a cached path starting at start_point, or None on a miss
+        """
+        cached = self.__path_cache.get(cache_key)
+        if cached is None:
+            self.path_cache_misses += 1
+            return None
+        self.path_cache_hits += 1
+        self.__path_cache.move_to_end(cache_key)
+        path = [start_point]
+        path.extend([x, y] for x, y in cached)
+        return path
+
+    def _cache_path(self, cache_key, path):
+        """Caches the steps of a path after its start, evicting the least recently used paths past path_cache_size
+        """
+        if self.path_cache_size <= 0:
             return
+        self.__path_cache[cache_key] = tuple((x, y) for x, y in path[1:])
+        while len(self.__path_cache) > self.path_cache_size:
+            self.__path_cache.popitem(last=False)
+
+    def _run_skipped_search(self):
+        """Reruns the search for the last path served from the cache, so the working arrays match it
+        """
+        if self.__skipped_search is None:
+            return
+        start_point, end_points, game_state, blocked_bits = self.__skipped_search
+        self.initialize_map(game_state, blocked_bits)
+        start = int(start_point[0]) * ARENA_SIZE + int(start_point[1])
+        end_flats, end_set = self._get_end_point_flats(end_points)
+        direction_key = _direction_key(self._get_direction_from_endpoints(end_points))
+        self._validate_flat(self._ideal_tile_flat(start, end_flats, end_set, direction_key), end_flats, end_set)
+
+    def clear_path_cache(self):
+        """Empties the path cache and resets its hit and miss counters
+        """
+        self.__path_cache.clear()
+        self.path_cache_hits = 0
+        self.path_cache_misses = 0
+
+    def get_path_cache_info(self):
+        """Gets statistics about the path cache
+
+        Returns:
+            A dict with the number of cache hits and misses, the number of cached paths and the maximum size
+        """
+        return {"hits": self.path_cache_hits, "misses": self.path_cache_misses, "size": len(self.__path_cache), "max_size": self.path_cache_size}
+
+    def navigate_multiple_endpoints_batch(self, start_points, end_points, game_state, blocked_bits=None):
+        """Finds the paths units at several start points would take to reach the same set of endpoints
+
+        Starts are grouped by the tile they path towards. Every start in a pocket that can reach the endpoints
+        shares a single validation search, as does every start in the same closed pocket, so the cost grows
+        with the number of pockets rather than the number of starts.
+
+        Args:
+            * start_points: A list of starting locations
+            * end_points: The end points of the units, should be a list of edge locations
+            * game_state: The current game state
+            * blocked_bits: A bitboard of blocked locations to path around instead of the game map's structures
+
+        Returns:
+            A list with the path from each start point, in the same order as start_points, as
+            navigate_multiple_endpoints would return it. Blocked or out of bounds starts get None.
+
+        """
+        end_flats, end_set = self._get_end_point_flats(end_points)
+        direction_key = _direction_key(self._get_direction_from_endpoints(end_points))
+        in_arena_bounds = game_state.game_map.in_arena_bounds
+        if blocked_bits is None:
+            blocked_bits = game_state.game_map.blocked_bits
+        self.initialize_map(game_state, blocked_bits)
+        blocked = self.__blocked
+        pocket = self.__pocket
+        stamp = self.__idealness_stamp
+        batch_generation = self.__generation
+
+        # Map each start to its ideal tile, labelling each pocket once. Pockets that reach an endpoint all
+        # validate from every endpoint, so they share the key -1.
+        edge = _EDGE_BY_FLAT_SET.get(end_set)
+        groups = {}
+        paths = [None] * len(start_points)
+        for index, start_point in enumerate(start_points):
+            if not in_arena_bounds(start_point):
+                continue
+            start = int(start_point[0]) * ARENA_SIZE + int(start_point[1])
+            if blocked[start]:
+                continue
+            paths[index] = self._get_cached_path((blocked_bits, start, end_set), start_point)
+            if paths[index] is not None:
+                continue
+            if edge is not None:
+                ideal_tile = self._component_ideal_tile(start, edge)
+            else:
+                if stamp[start] != batch_generation:
+                    self._label_pocket_flat(start, end_set, direction_key)
+                ideal_tile = -1 if pocket[start] in end_set else pocket[start]
+            groups.setdefault(ideal_tile, []).append((index, start_point, start))
+
+        for ideal_tile, members in groups.items():
+            self._validate_flat(end_flats[0] if ideal_tile == -1 else ideal_tile, end_flats, end_set)
+            for index, start_point, start in members:
+                paths[index] = self._get_path_flat(start_point, start, direction_key)
+                self._cache_path((blocked_bits, start, end_set), paths[index])
+        return paths
+
+    def navigate_multiple_layouts(self, start_point, end_points, blocked_layouts, game_state, use_numpy=None):
+        """Finds the path a unit would take to reach a set of endpoints on each of several hypothetical layouts
+
+        With NumPy installed, large batches are solved together: one vectorised search from the start finds the
+        ideal tile of every layout, and a second computes every distance field. Otherwise each layout is searched
+        in turn, repairing the distance field of the previous similar layout. Paths are walked with the same
+        tie-breaking either way.
+
+        Args:
+            * start_point: The starting location of the unit
+            * end_points: The end points of the unit, should be a list of edge locations
+            * blocked_layouts: A list of bitboards of blocked locations, for example game_map.blocked_bits | locations_to_bits(walls)
+            * game_state: The current game state
+            * use_numpy: Whether to use NumPy, decided by min_numpy_layouts and whether it is installed if None
+
+        Returns:
+            A list with the path for each layout, in the same order, as navigate_multiple_endpoints would return it
+            on a map blocked at exactly those locations. Layouts that block the start get None.
+
+        """
+        layouts = list(blocked_layouts)
+        paths = [None] * len(layouts)
+        if not layouts or not game_state.game_map.in_arena_bounds(start_point):
+            return paths
+        if use_numpy is None:
+            use_numpy = HAVE_NUMPY and len(layouts) >= self.min_numpy_layouts
+        if use_numpy and not HAVE_NUMPY:
+            debug_write("navigate_multiple_layouts requires NumPy to use_numpy, falling back to the pure Python search")
+            use_numpy = False
 
-        #Initialize map 
         self.initialize_map(game_state)
-        #Fill in walls
-        for location in self.game_state.game_map:
-            if self.game_state.contains_stationary_unit(location):
-                self.game_map[location[0]][location[1]].blocked = True
-        #Do pathfinding
-        ideal_endpoints = self._idealness_search(start_point, end_points)
-        self._validate(ideal_endpoints, end_points)
-        return self._get_path(start_point, end_points)
+        start = int(start_point[0]) * ARENA_SIZE + int(start_point[1])
+        end_flats, end_set = self._get_end_point_flats(end_points)
+        direction_key = _direction_key(self._get_direction_from_endpoints(end_points))
+
+        if use_numpy:
+            fields = self._layout_fields_numpy(layouts, start, end_flats, direction_key)
+        for index, layout in enumerate(layouts):
+            if (layout >> start) & 1:
+                continue
+            self._set_blocked_bits(layout)
+            if use_numpy:
+                self.__field = fields[index].ravel().tolist()
+            else:
+                self.__generation += 1
+                self._validate_flat(self._ideal_tile_flat(start, end_flats, end_set, direction_key), end_flats, end_set)
+            paths[index] = self._get_path_flat(start_point, start, direction_key)
+        return paths
+
+    def _layout_fields_numpy(self, layouts, start, end_flats, direction_key):
+        """Computes the distance field each layout validates, with the ideal tile of the start's pocket found
+        by a first vectorised search from the start
+        """
+        blocked = bits_to_grids(layouts)
+        start_x, start_y = _FLAT_X[start], _FLAT_Y[start]
+        start_grid = np.zeros(blocked.shape, dtype=bool)
+        start_grid[:, start_x, start_y] = True
+        reached = reached_grids(blocked, start_grid)
+
+        end_grid = np.zeros((ARENA_SIZE, ARENA_SIZE), dtype=bool)
+        for flat in end_flats:
+            end_grid[_FLAT_X[flat], _FLAT_Y[flat]] = True
+        reaches_end = (reached & end_grid).any(axis=(1, 2))
+        ideal_tiles = np.where(reached, _IDEALNESS_GRIDS[direction_key], -1).reshape(len(layouts), -1).argmax(axis=1)
+
+        sources = np.zeros(blocked.shape, dtype=bool)
+        sources.reshape(len(layouts), -1)[np.arange(len(layouts)), ideal_tiles] = True
+        sources[reaches_end] = end_grid
+        return distance_fields(blocked, sources)
+
+    def _label_pocket_flat(self, start, end_set, direction_key):
+        """Floods the whole pocket containing start, stamping each location with the current generation and
+        recording the pocket's most ideal tile, an endpoint if any is reachable, as its label.
+        """
+        generation = self.__generation
+        stamp = self.__idealness_stamp
+        pocket = self.__pocket
+        blocked = self.__blocked
+        queue = self.__queue
+        idealness = _IDEALNESS[direction_key]
+
+        stamp[start] = generation
+        queue[0] = start
+        head, tail = 0, 1
+        most_ideal = start
+        reaches_end = start in end_set
 
-    def _idealness_search(self, start, end_points):
+        while head < tail:
+            search_location = queue[head]
+            head += 1
+            for neighbor in _NEIGHBORS[search_location]:
+                if blocked[neighbor] or stamp[neighbor] == generation:
+                    continue
+                if reaches_end:
+                    pass
+                elif neighbor in end_set:
+                    reaches_end = True
+                    most_ideal = neighbor
+                elif idealness[neighbor] > idealness[most_ideal]:
+                    most_ideal = neighbor
+                stamp[neighbor] = generation
+                queue[tail] = neighbor
+                tail += 1
+
+        for location in queue[:tail]:
+            pocket[location] = most_ideal
+        return most_ideal
+
+    def can_reach_endpoints(self, start_point, end_points, game_state):
+        """Checks whether a unit at start_point can reach any of end_points, or will self destruct instead
+
+        Args:
+            * start_point: The starting location of the unit
+            * end_points: The end points of the unit, should be a list of edge locations
+            * game_state: The current game state
+
+        Returns:
+            True if an endpoint is reachable, False if it is not or start_point is blocked or out of bounds
+
+        """
+        if not game_state.game_map.in_arena_bounds(start_point):
+            return False
+        self._set_blocked_bits(game_state.game_map.blocked_bits)
+        start = int(start_point[0]) * ARENA_SIZE + int(start_point[1])
+        if self.__blocked[start]:
+            return False
+        end_flats, end_set = self._get_end_point_flats(end_points)
+        direction_key = _direction_key(self._get_direction_from_endpoints(end_points))
+        edge = _EDGE_BY_FLAT_SET.get(end_set)
+        if edge is not None:
+            return self._component_ideal_tile(start, edge) == -1
+        self.__generation += 1
+        return self._idealness_search_flat(start, end_set, direction_key) in end_set
+
+    def _ideal_tile_flat(self, start, end_flats, end_set, direction_key):
+        """Finds the most ideal tile in the start's pocket, as a flat index. Looked up from the component labels
+        when the endpoints are an edge, which gives the first endpoint whenever any endpoint is reachable.
+        """
+        edge = _EDGE_BY_FLAT_SET.get(end_set)
+        ideal_tile = None if edge is None else self._component_ideal_tile(start, edge, False)
+        if ideal_tile is None:
+            return self._idealness_search_flat(start, end_set, direction_key)
+        return end_flats[0] if ideal_tile == -1 else ideal_tile
+
+    def _component_ideal_tile(self, start, edge, label_new_layouts=True):
+        """Gets the most ideal tile towards an edge in the start's pocket, or -1 if the pocket reaches the edge,
+        labelling the pocket if it has not been labelled for the current blocked layout.
+        Returns None instead the first time a layout is seen, unless label_new_layouts is set, as a single
+        search is cheaper without labelling.
         """
-        Finds the most ideal tile in our 'pocket' of pathable space. 
+        blocked_bits = self.__blocked_bits
+        components = self.__components
+        if blocked_bits not in components:
+            components[blocked_bits] = None
+            while len(components) > max(self.component_cache_size, 1):
+                components.popitem(last=False)
+            if not label_new_layouts:
+                return None
+        entry = components[blocked_bits]
+        if entry is None:
+            entry = ([-1] * _FLAT_SIZE, [])
+            components[blocked_bits] = entry
+        components.move_to_end(blocked_bits)
+        labels, ideal_tiles = entry
+        label = labels[start]
+        if label == -1:
+            label = self._label_component(start, labels, ideal_tiles)
+        return ideal_tiles[label][edge]
+
+    def _label_component(self, start, labels, ideal_tiles):
+        """Labels every location in the start's pocket and records the pocket's ideal tile towards each edge
+        """
+        label = len(ideal_tiles)
+        blocked = self.__blocked
+        queue = self.__queue
+        labels[start] = label
+        queue[0] = start
+        head, tail = 0, 1
+        while head < tail:
+            location = queue[head]
+            head += 1
+            for neighbor in _NEIGHBORS[location]:
+                if blocked[neighbor] or labels[neighbor] != -1:
+                    continue
+                labels[neighbor] = label
+                queue[tail] = neighbor
+                tail += 1
+
+        members = queue[:tail]
+        component_tiles = []
+        for edge, edge_set in enumerate(_EDGE_FLAT_SETS):
+            if edge_set.isdisjoint(members):
+                component_tiles.append(max(members, key=_IDEALNESS[_EDGE_DIRECTION_KEYS[edge]].__getitem__))
+            else:
+                component_tiles.append(-1)
+        ideal_tiles.append(tuple(component_tiles))
+        return label
+
+    def _get_end_point_flats(self, end_points):
+        """Gets the on-board end_points as a tuple and a frozenset of flat indexes.
+        Edges from get_edge_locations map onto precomputed tables.
+        """
+        end_point_set = self._get_end_point_set(end_points)
+        for edge, edge_set in enumerate(EDGE_SETS):
+            if end_point_set is edge_set:
+                return _EDGE_FLATS[edge], _EDGE_FLAT_SETS[edge]
+        end_flats = []
+        for x, y in end_points:
+            if 0 <= x < ARENA_SIZE and 0 <= y < ARENA_SIZE and BOUNDS_MASK[int(x) * ARENA_SIZE + int(y)]:
+                flat = int(x) * ARENA_SIZE + int(y)
+                if flat not in end_flats:
+                    end_flats.append(flat)
+        return tuple(end_flats), frozenset(end_flats)
+
+    def _idealness_search_flat(self, start, end_set, direction_key):
+        """
+        Finds the most ideal tile in our 'pocket' of pathable space, as a flat index.
         The edge if it is available, or the best self destruct location otherwise
         """
-        current = queue.Queue()
-        current.put(start)
-        best_idealness = self._get_idealness(start, end_points)
-        self.game_map[start[0]][start[1]].visited_idealness = True
+        if start in end_set:
+            return start
+        generation = self.__generation
+        stamp = self.__idealness_stamp
+        blocked = self.__blocked
+        queue = self.__queue
+        idealness = _IDEALNESS[direction_key]
+
+        stamp[start] = generation
+        queue[0] = start
+        head, tail = 0, 1
+        best_idealness = idealness[start]
         most_ideal = start
 
-        while not current.empty():
-            search_location = current.get()
-            for neighbor in self._get_neighbors(search_location):
-                if not self.game_state.game_map.in_arena_bounds(neighbor) or self.game_map[neighbor[0]][neighbor[1]].blocked:
+        while head < tail:
+            search_location = queue[head]
+            head += 1
+            for neighbor in _NEIGHBORS[search_location]:
+                if blocked[neighbor] or stamp[neighbor] == generation:
                     continue
+                # Every endpoint is perfectly ideal, and any of them leads _validate to use all of them
+                if neighbor in end_set:
+                    return neighbor
+                if idealness[neighbor] > best_idealness:
+                    best_idealness = idealness[neighbor]
+                    most_ideal = neighbor
+                stamp[neighbor] = generation
+                queue[tail] = neighbor
+                tail += 1
 
-                x, y = neighbor
-                current_idealness = self._get_idealness(neighbor, end_points)
+        return most_ideal
 
-                if current_idealness > best_idealness:
-                    best_idealness = current_idealness
-                    most_ideal = neighbor
+    def _validate_flat(self, ideal_tile, end_flats, end_set):
+        """Sets the distance field of the grid from the ideal tile, or from every endpoint if the ideal tile is
+        one of them, repairing or reusing the field kept for the same sources where possible
 
-                if not self.game_map[x][y].visited_idealness and not self.game_map[x][y].blocked:
-                    self.game_map[x][y].visited_idealness = True
-                    current.put(neighbor)
+        """
+        if ideal_tile in end_set:
+            key, sources = end_set, end_flats
+        else:
+            key, sources = ideal_tile, (ideal_tile,)
+        blocked_bits = self.__blocked_bits
+        fields = self.__fields
+        entry = fields.get(key)
+        if entry is None:
+            entry = [blocked_bits, self._search_field(sources, [-1] * _FLAT_SIZE)]
+            fields[key] = entry
+            while len(fields) > max(self.field_cache_size, 1):
+                fields.popitem(last=False)
+        else:
+            fields.move_to_end(key)
+            changed = entry[0] ^ blocked_bits
+            if changed:
+                if popcount(changed) <= self.max_field_repairs:
+                    self._repair_field(entry[1], changed, key if key is end_set else frozenset(sources))
+                else:
+                    self._search_field(sources, entry[1])
+                entry[0] = blocked_bits
+        self.__field = entry[1]
 
-        return most_ideal
+    def _search_field(self, sources, pathlength):
+        """Breadth first search of the grid from the sources, setting the pathlength of each reachable location
+        and -1 everywhere else. Blocked sources have a pathlength of 0 but are not searched from.
+
+        """
+        blocked = self.__blocked
+        queue = self.__queue
+        pathlength[:] = _UNREACHED
+
+        tail = 0
+        for location in sources:
+            queue[tail] = location
+            tail += 1
+            pathlength[location] = 0
+
+        head = 0
+        while head < tail:
+            current_location = queue[head]
+            head += 1
+            if blocked[current_location]:
+                continue
+            next_pathlength = pathlength[current_location] + 1
+            for neighbor in _NEIGHBORS[current_location]:
+                if blocked[neighbor] or pathlength[neighbor] != -1:
+                    continue
+                pathlength[neighbor] = next_pathlength
+                queue[tail] = neighbor
+                tail += 1
+        return pathlength
+
+    def _repair_field(self, pathlength, changed, source_set):
+        """Updates a distance field for a blocked layout that differs at the changed bits, one location at a time
+        """
+        blocked = self.__blocked
+        locations = []
+        while changed:
+            lowest = changed & -changed
+            location = lowest.bit_length() - 1
+            # Start from the layout the field was computed for
+            blocked[location] ^= 1
+            locations.append(location)
+            changed ^= lowest
+        for location in locations:
+            blocked[location] ^= 1
+            if blocked[location]:
+                self._repair_blocked(pathlength, location, location in source_set)
+            else:
+                self._repair_unblocked(pathlength, location, location in source_set)
+
+    def _repair_blocked(self, pathlength, location, is_source):
+        """Updates a distance field after location becomes blocked.
+        Locations that no longer have a neighbor one step closer are orphaned level by level, then given the
+        shortest distance through their remaining neighbors.
+        """
+        blocked = self.__blocked
+        level = pathlength[location]
+        if level == -1:
+            return
+        if not is_source:
+            pathlength[location] = -1
+
+        orphans = []
+        frontier = [location]
+        while frontier:
+            level += 1
+            candidates = set()
+            for parent in frontier:
+                for neighbor in _NEIGHBORS[parent]:
+                    if pathlength[neighbor] == level and not blocked[neighbor]:
+                        candidates.add(neighbor)
+            frontier = []
+            for candidate in candidates:
+                for neighbor in _NEIGHBORS[candidate]:
+                    if pathlength[neighbor] == level - 1 and not blocked[neighbor]:
+                        break
+                else:
+                    pathlength[candidate] = -1
+                    frontier.append(candidate)
+            orphans.extend(frontier)
+
+        heap = []
+        for orphan in orphans:
+            best = -1
+            for neighbor in _NEIGHBORS[orphan]:
+                neighbor_pathlength = pathlength[neighbor]
+                if neighbor_pathlength != -1 and not blocked[neighbor] and (best == -1 or neighbor_pathlength < best):
+                    best = neighbor_pathlength
+            if best != -1:
+                heap.append((best + 1, orphan))
+        heapq.heapify(heap)
+        while heap:
+            distance, orphan = heapq.heappop(heap)
+            if pathlength[orphan] != -1:
+                continue
+            pathlength[orphan] = distance
+            for neighbor in _NEIGHBORS[orphan]:
+                if pathlength[neighbor] == -1 and not blocked[neighbor]:
+                    heapq.heappush(heap, (distance + 1, neighbor))
+
+    def _repair_unblocked(self, pathlength, location, is_source):
+        """Updates a distance field after location stops being blocked, relaxing distances outwards from it
+        """
+        blocked = self.__blocked
+        if not is_source:
+            best = -1
+            for neighbor in _NEIGHBORS[location]:
+                neighbor_pathlength = pathlength[neighbor]
+                if neighbor_pathlength != -1 and not blocked[neighbor] and (best == -1 or neighbor_pathlength < best):
+                    best = neighbor_pathlength
+            if best == -1:
+                return
+            pathlength[location] = best + 1
+
+        queue = self.__queue
+        queue[0] = location
+        head, tail = 0, 1
+        while head < tail:
+            current_location = queue[head]
+            head += 1
+            next_pathlength = pathlength[current_location] + 1
+            for neighbor in _NEIGHBORS[current_location]:
+                if blocked[neighbor]:
+                    continue
+                neighbor_pathlength = pathlength[neighbor]
+                if neighbor_pathlength == -1 or neighbor_pathlength > next_pathlength:
+                    pathlength[neighbor] = next_pathlength
+                    queue[tail] = neighbor
+                    tail += 1
+
+    def _get_path_flat(self, start_point, start, direction_key):
+        """Once all nodes are validated, and a target is found, the unit can path to its target.
+        This is _choose_next_move and _better_direction inlined over the flat arrays.
+
+        """
+        pathlength = self.__field
+        blocked = self.__blocked
+        direction_x = 1 if direction_key & 1 else -1
+        direction_y = 1 if direction_key & 2 else -1
+        HORIZONTAL, VERTICAL = self.HORIZONTAL, self.VERTICAL
+
+        path = [start_point]
+        current = start
+        move_direction = 0
+        while pathlength[current] != 0:
+            current_x, current_y = _FLAT_X[current], _FLAT_Y[current]
+            ideal_neighbor = current
+            best_pathlength = pathlength[current]
+            for neighbor in _NEIGHBORS[current]:
+                if blocked[neighbor]:
+                    continue
+                current_pathlength = pathlength[neighbor]
+
+                #Filter by pathlength
+                if current_pathlength > best_pathlength:
+                    continue
+                elif current_pathlength == best_pathlength:
+                    #Filter by direction based on prev move
+                    new_x, new_y = _FLAT_X[neighbor], _FLAT_Y[neighbor]
+                    best_x, best_y = _FLAT_X[ideal_neighbor], _FLAT_Y[ideal_neighbor]
+                    if move_direction == HORIZONTAL and new_x != best_x:
+                        better = current_y != new_y
+                    elif move_direction == VERTICAL and new_y != best_y:
+                        better = current_x != new_x
+                    elif move_direction == 0:
+                        better = current_y != new_y
+                    elif new_y == best_y:
+                        better = (direction_x == 1 and new_x > best_x) or (direction_x == -1 and new_x < best_x)
+                    elif new_x == best_x:
+                        better = (direction_y == 1 and new_y > best_y) or (direction_y == -1 and new_y < best_y)
+                    else:
+                        better = True
+                    if not better:
+                        continue
+
+                ideal_neighbor = neighbor
+                best_pathlength = current_pathlength
+
+            if ideal_neighbor == current:
+                break
+            if current_x == _FLAT_X[ideal_neighbor]:
+                move_direction = VERTICAL
+            else:
+                move_direction = HORIZONTAL
+            path.append([_FLAT_X[ideal_neighbor], _FLAT_Y[ideal_neighbor]])
+            current = ideal_neighbor
+
+        return path
+
+    def _idealness_search(self, start, end_points):
+        """
+        Finds the most ideal tile in our 'pocket' of pathable space.
+        The edge if it is available, or the best self destruct location otherwise
+        """
+        end_flats, end_set = self._get_end_point_flats(end_points)
+        direction_key = _direction_key(self._get_direction_from_endpoints(end_points))
+        most_ideal = self._idealness_search_flat(start[0] * ARENA_SIZE + start[1], end_set, direction_key)
+        return [_FLAT_X[most_ideal], _FLAT_Y[most_ideal]]
+
+    def _get_end_point_set(self, end_points):
+        """Gets end_points as a set of (x, y) tuples, reusing the last result for the same locations.
+        Compared by contents, so a list changed in place since the last call is not mistaken for it
+        """
+        key = tuple((location[0], location[1]) for location in end_points)
+        if key != self.__end_points:
+            self.__end_point_set = edge_location_set(end_points)
+            self.__end_points = key
+        return self.__end_point_set
 
     def _get_neighbors(self, location):
         """Get the locations adjacent to a location
@@ -119,7 +789,7 @@ class ShortestPathFinder:
         """Prints a message to the games debug output
 
         Args:
-            * end_points: A set of endpoints, should be an edge 
+            * end_points: A set of endpoints, should be an edge
 
         Returns:
             A direction [x,y] representing the edge. For example, [1,1] for the top right and [-1, 1] for the top left
@@ -128,20 +798,20 @@ class ShortestPathFinder:
         point = end_points[0]
         x, y = point
         direction = [1, 1]
-        if x < self.game_state.HALF_ARENA:
+        if x < HALF_ARENA:
            direction[0] = -1
-        if y < self.game_state.HALF_ARENA:
+        if y < HALF_ARENA:
             direction[1] = -1
         return direction
 
     def _get_idealness(self, location, end_points):
         """Get the idealness of a tile, the reachable tile the unit most wants to path to.
-        Better self destruct locations are more ideal. The endpoints are perfectly ideal. 
+        Better self destruct locations are more ideal. The endpoints are perfectly ideal.
 
         Returns:
             A location the unit will attempt to reach
         """
-        if location in end_points:
+        if (location[0], location[1]) in self._get_end_point_set(end_points):
             return sys.maxsize
 
         direction = self._get_direction_from_endpoints(end_points)
@@ -149,11 +819,11 @@ class ShortestPathFinder:
         idealness = 0
         if direction[1] == 1:
             idealness += 28 * location[1]
-        else: 
+        else:
             idealness += 28 * (27 - location[1])
         if direction[0] == 1:
             idealness += location[0]
-        else: 
+        else:
             idealness += (27 - location[0])
 
         return idealness
@@ -162,84 +832,46 @@ class ShortestPathFinder:
         """Breadth first search of the grid, setting the pathlengths of each node
 
         """
-        #VALIDATION
-        #Add our most ideal tiles to current
-        current = queue.Queue()
-        if ideal_tile in end_points:
-            for location in end_points:
-               current.put(location)
-               #Set current pathlength to 0
-               self.game_map[location[0]][location[1]].pathlength = 0
-               self.game_map[location[0]][location[1]].visited_validate = True
-        else:
-            current.put(ideal_tile)
-            self.game_map[ideal_tile[0]][ideal_tile[1]].pathlength = 0
-            self.game_map[ideal_tile[0]][ideal_tile[1]].visited_validate = True
-
-        #While current is not empty
-        while not current.empty():
-            current_location = current.get()
-            current_node = self.game_map[current_location[0]][current_location[1]]
-            for neighbor in self._get_neighbors(current_location):
-                if not self.game_state.game_map.in_arena_bounds(neighbor) or self.game_map[neighbor[0]][neighbor[1]].blocked:
-                    continue
-
-                neighbor_node = self.game_map[neighbor[0]][neighbor[1]]
-                if not neighbor_node.visited_validate and not current_node.blocked:
-                    neighbor_node.pathlength = current_node.pathlength + 1
-                    neighbor_node.visited_validate = True
-                    current.put(neighbor)
-
-        #debug_write("Print after validate")
-        #self.print_map()
-        return
+        end_flats, end_set = self._get_end_point_flats(end_points)
+        self._validate_flat(ideal_tile[0] * ARENA_SIZE + ideal_tile[1], end_flats, end_set)
 
     def _get_path(self, start_point, end_points):
         """Once all nodes are validated, and a target is found, the unit can path to its target
 
         """
-        #GET THE PATH
-        path = [start_point]
-        current = start_point
-        move_direction = 0
+        direction_key = _direction_key(self._get_direction_from_endpoints(end_points))
+        return self._get_path_flat(start_point, start_point[0] * ARENA_SIZE + start_point[1], direction_key)
 
-        while not self.game_map[current[0]][current[1]].pathlength == 0:
-            #debug_write("current tile {} has cost {}".format(current, self.game_map[current[0]][current[1]].pathlength))
-            next_move = self._choose_next_move(current, move_direction, end_points)
-            #debug_write(next_move)
+    def _get_pathlength(self, location):
+        """Gets the pathlength of a location from the last validation step, or -1 if it was not reached
+        """
+        self._run_skipped_search()
+        return self.__field[location[0] * ARENA_SIZE + location[1]]
+
+    def _is_blocked(self, location):
+        """Checks if a location was blocked during the last search
+        """
+        self._run_skipped_search()
+        return bool(self.__blocked[location[0] * ARENA_SIZE + location[1]])
 
-            if current[0] == next_move[0]:
-                move_direction = self.VERTICAL
-            else:
-                move_direction = self.HORIZONTAL
-            path.append(next_move)
-            current = next_move
-        
-        #debug_write(path)
-        return path
-  
     def _choose_next_move(self, current_point, previous_move_direction, end_points):
         """Given the current location and adjacent locations, return the best 'next step' for a given unit to take
         """
         neighbors = self._get_neighbors(current_point)
-        #debug_write("Unit at {} previously moved {} and has these neighbors {}".format(current_point, previous_move_direction, neighbors))
 
         ideal_neighbor = current_point
-        best_pathlength = self.game_map[current_point[0]][current_point[1]].pathlength
+        best_pathlength = self._get_pathlength(current_point)
         for neighbor in neighbors:
-            #debug_write("Comparing champ {} and contender {}".format(ideal_neighbor, neighbor))
-            if not self.game_state.game_map.in_arena_bounds(neighbor) or self.game_map[neighbor[0]][neighbor[1]].blocked:
+            if not self.game_state.game_map.in_arena_bounds(neighbor) or self._is_blocked(neighbor):
                 continue
 
             new_best = False
-            x, y = neighbor
-            current_pathlength = self.game_map[x][y].pathlength
+            current_pathlength = self._get_pathlength(neighbor)
 
             #Filter by pathlength
             if current_pathlength > best_pathlength:
                 continue
             elif current_pathlength < best_pathlength:
-                #debug_write("Contender has better pathlength at {} vs champs {}".format(current_pathlength, best_pathlength))
                 new_best = True
 
             #Filter by direction based on prev move
@@ -249,7 +881,6 @@ class ShortestPathFinder:
             ideal_neighbor = neighbor
             best_pathlength = current_pathlength
 
-        #debug_write("Gave unit at {} new tile {}".format(current_point, ideal_neighbor))
         return ideal_neighbor
 
     def _better_direction(self, prev_tile, new_tile, prev_best, previous_move_direction, end_points):
@@ -261,26 +892,25 @@ class ShortestPathFinder:
         if previous_move_direction == self.HORIZONTAL and not new_tile[0] == prev_best[0]:
             #We want to go up now. If we have not changed our y, we are not going up
             if prev_tile[1] == new_tile[1]:
-                return False 
+                return False
             return True
         if previous_move_direction == self.VERTICAL and not new_tile[1] == prev_best[1]:
             if prev_tile[0] == new_tile[0]:
-                #debug_write("contender {} has the same x coord as prev tile {} so we will keep best move {}".format(new_tile, prev_tile, prev_best))
                 return False
             return True
-        if previous_move_direction == 0: 
-            if prev_tile[1] == new_tile[1]: 
+        if previous_move_direction == 0:
+            if prev_tile[1] == new_tile[1]:
                 return False
             return True
-        
-        #To make it here, both moves are on the same axis 
+
+        #To make it here, both moves are on the same axis
         direction = self._get_direction_from_endpoints(end_points)
         if new_tile[1] == prev_best[1]: #If they both moved horizontal...
             if direction[0] == 1 and new_tile[0] > prev_best[0]: #If we moved right and right is our direction, we moved towards our direction
-                return True 
+                return True
             if direction[0] == -1 and new_tile[0] < prev_best[0]: #If we moved left and left is our direction, we moved towards our direction
-                return True 
-            return False 
+                return True
+            return False
         if new_tile[0] == prev_best[0]: #If they both moved vertical...
             if direction[1] == 1 and new_tile[1] > prev_best[1]: #If we moved up and up is our direction, we moved towards our direction
                 return True
@@ -297,11 +927,13 @@ class ShortestPathFinder:
             debug_write("Attempted to print_map before pathfinder initialization. Use 'this_object.initialize_map(game_state)' to initialize the map first")
             return
 
+        self._run_skipped_search()
         for y in range(28):
             for x in range(28):
-                node = self.game_map[x][28 - y - 1]
-                if not node.blocked and not node.pathlength == -1:
-                    self._print_justified(node.pathlength)
+                location = [x, 28 - y - 1]
+                pathlength = self._get_pathlength(location)
+                if not self._is_blocked(location) and not pathlength == -1:
+                    self._print_justified(pathlength)
                 else:
                     sys.stderr.write("   ")
             debug_write("")
@@ -0,0 +1,119 @@
+"""
+Scores candidate turns across several processes. Each candidate is a list of actions to try on a copy of the
+current GameState, and is scored by a function run in a worker process, by default gamelib.simulate.
+
+Workers receive the config once, when the pool starts, and the board of each GameState as the compact dict
+from GameState.get_serialized_board. Score functions are sent to the workers by reference, so they must be
+defined at the top level of a module, and should only print with debug_write.
+"""
+import multiprocessing
+from .game_state import GameState
+from .navigation import ShortestPathFinder
+from .simulation import simulate
+from .unit import compile_unit_prototypes
+
+
+def simulation_score(game_state):
+    """The default score of a candidate, the result of gamelib.simulate with the destroyed structures
+    given as [x, y, unit_type, player_index] so that they are cheap to send back
+
+    Args:
+        game_state: The GameState with the candidate's actions applied
+
+    Returns:
+        The dict returned by simulate
+
+    """
+    result = simulate(game_state)
+    result["destroyed_structures"] = [[unit.x, unit.y, unit.unit_type, unit.player_index] for unit in result["destroyed_structures"]]
+    return result
+
+
+"""
+The config and path finder of the current process, set when a worker starts or when a pool runs in process.
+The path finder is shared by every candidate a worker scores, so paths found for one are cached for the next.
+"""
+_worker_config = None
+_worker_path_finder = None
+
+
+def _initialize_worker(config):
+    global _worker_config, _worker_path_finder
+    _worker_config = config
+    _worker_path_finder = ShortestPathFinder()
+    compile_unit_prototypes(config)
+
+
+def _score_candidate(task):
+    """
+    Applies a candidate's actions to a new GameState created from a serialized board, and scores it.
+    """
+    index, board, actions, score = task
+    game_state = GameState(_worker_config, board)
+    game_state.suppress_warnings(True)
+    game_state._shortest_path_finder = _worker_path_finder
+    remove = _worker_config["unitInformation"][6]["shorthand"]
+    upgrade = _worker_config["unitInformation"][7]["shorthand"]
+    for action in actions:
+        unit_type, location = action[0], action[1]
+        if unit_type == upgrade:
+            game_state.attempt_upgrade([location])
+        elif unit_type == remove:
+            game_state.attempt_remove([location])
+        else:
+            game_state.attempt_spawn(unit_type, location, action[2] if len(action) > 2 else 1)
+    return index, score(game_state)
+
+
+class RolloutPool:
+    """Scores candidate turns in a pool of worker processes.
+    Usually started with AlgoCore.start_rollout_pool in on_game_start, which also closes it when the game ends.
+
+    Attributes :
+        * processes (int): The number of worker processes. 0 if candidates are scored in this process
+
+    """
+    def __init__(self, config, processes=None):
+        """ Starts the worker processes and sends them the config
+
+        Args:
+            * config (JSON): A json object containing information about the game
+            * processes (int): The number of worker processes, by default one per CPU. 0 scores candidates in this process
+
+        """
+        self.config = config
+        self.processes = multiprocessing.cpu_count() if processes is None else processes
+        self.__pool = None
+        if self.processes > 0:
+            self.__pool = multiprocessing.Pool(self.processes, initializer=_initialize_worker, initargs=(config,))
+        else:
+            _initialize_worker(config)
+
+    def evaluate(self, game_state, candidates, score=simulation_score, chunksize=1):
+        """Scores each candidate turn on a copy of a GameState
+
+        Args:
+            game_state: The GameState to apply the candidates to. Units it has already spawned are included
+            candidates: A list of candidates, each a list of actions. An action is [unit_type, location] or
+                [unit_type, location, num], and is applied with attempt_spawn, or attempt_upgrade and attempt_remove
+                when unit_type is UPGRADE or REMOVE
+            score: A top level function taking the GameState with a candidate's actions applied, returning its score
+            chunksize: The number of candidates sent to a worker at once
+
+        Returns:
+            An iterator of (index, score) for each candidate, in the order the scores are ready
+
+        """
+        board = game_state.get_serialized_board()
+        tasks = ((index, board, actions, score) for index, actions in enumerate(candidates))
+        if self.__pool is None:
+            return map(_score_candidate, tasks)
+        return self.__pool.imap_unordered(_score_candidate, tasks, chunksize)
+
+    def close(self):
+        """Stops the worker processes once they finish the candidates they were given
+        """
+        if self.__pool is not None:
+            self.__pool.close()
+            self.__pool.join()
+            self.__pool = None
@@ -0,0 +1,255 @@
+"""
+Plays out an action phase on a copy of a GameState's board, to predict its outcome without the game engine.
+
+Each frame follows the order of the game engine:
+
+    1. Supports shield friendly mobile units in their range, once per unit
+    2. Mobile units take a step along their path, once every 1 / speed frames. Units that reach their
+       target edge breach, and units at the end of a path that does not reach it self destruct
+    3. Every unit attacks the target get_target would choose for it
+    4. Units with no health left are removed, and the others repath if a structure was destroyed
+
+Units destroyed by self destructs in step 2 are removed before step 3, so they neither attack nor are targeted.
+
+Attacks within a frame are simultaneous, and a unit keeps its place in its cell's list for as long as it stays there.
+Paths come from the GameState's ShortestPathFinder, so repeated rollouts on the same board reuse its path cache.
+"""
+import copy
+from .game_map import ARENA_SIZE, find_target, locations_in_range
+from .unit import GameUnit
+
+
+def simulate(game_state, deploys=None, enemy_deploys=None, max_frames=1000):
+    """Simulates the action phase of a turn, frame by frame, and returns what it changed.
+    The GameState is not modified, structures are copied before they take damage.
+
+    Shielding uses each support's shieldRange, shieldPerUnit and shieldBonusPerY, counting y from the support owner's
+    side of the board. Self destructs use selfDestructRange, selfDestructStepsRequired and the selfDestructDamage values,
+    and breaches use playerBreachDamage, giving the attacker the unit's metalForBreach SP, or coresForPlayerDamage
+    SP per point of damage in configs without it.
+    Structures pending removal are kept, and deploys are assumed to be valid.
+
+    Args:
+        game_state: The GameState to start from. Its structures and mobile units are all simulated,
+            including the units spawned with attempt_spawn
+        deploys: More of your mobile units to spawn on the first frame, as a list of [unit_type, location, num]
+        enemy_deploys: Your opponent's mobile units to spawn on the first frame, as a list of [unit_type, location, num]
+        max_frames: The number of frames to stop after if mobile units are still alive
+
+    Returns:
+        A dict with:
+            * frames (int): The number of frames simulated
+            * health_delta ([float, float]): The change in each player's health, from breaches
+            * resource_delta ([dict, dict]): The SP each player gained from breaches, {'SP': sp}. MP does not change
+              during an action phase
+            * structure_damage ([float, float]): The health each player's structures lost
+            * destroyed_structures (list): Copies of the structures that were destroyed, in the order they died
+            * breaches (list): [location, unit_type, player_index] for each unit that reached its target edge
+
+    """
+    action_phase = _ActionPhase(game_state)
+    for player_index, player_deploys in ((0, deploys or []), (1, enemy_deploys or [])):
+        for unit_type, location, num in player_deploys:
+            for _ in range(num):
+                action_phase.spawn(GameUnit(unit_type, game_state.config, player_index, None, int(location[0]), int(location[1])))
+    return action_phase.run(max_frames)
+
+
+class _MobileUnit:
+    """
+    A mobile unit being simulated, with the state needed to move it along its path.
+    """
+    __slots__ = ("unit", "end_points", "end_flats", "path", "step", "moves", "frames_per_move", "layout", "shielded_by")
+
+    def __init__(self, unit, end_points, end_flats):
+        self.unit = unit
+        self.end_points = end_points
+        self.end_flats = end_flats
+        self.path = None
+        self.step = 0
+        self.moves = 0
+        self.frames_per_move = max(1, int(round(1 / unit.speed))) if unit.speed > 0 else 0
+        self.layout = None
+        self.shielded_by = set()
+
+
+class _ActionPhase:
+    """
+    The units of an action phase being simulated. Units are indexed by owner and location as find_target expects,
+    self.mobile_units[player_index] and self.structures[player_index] mapping flat indexes to lists of units.
+    """
+    def __init__(self, game_state):
+        self.game_state = game_state
+        self.config = game_state.config
+        self.get_hit_radius = game_state._get_hit_radius
+        self.cores_per_damage = self.config.get("resources", {}).get("coresForPlayerDamage", 0)
+        self.unit_information = {information.get("shorthand"): information for information in self.config["unitInformation"]}
+        self.blocked_bits = game_state.game_map.blocked_bits
+        self.structures = ({}, {})
+        self.mobile_units = ({}, {})
+        self.structure_attackers = []
+        self.supports = []
+        self.simulated = []
+        self.edges = {}
+
+        self.health_delta = [0.0, 0.0]
+        self.sp_delta = [0.0, 0.0]
+        self.structure_damage = [0.0, 0.0]
+        self.destroyed_structures = []
+        self.breaches = []
+        self.dying_structures = []
+
+        game_map = game_state.game_map
+        for x, y in game_map.iter_locations(occupied_only=True):
+            for unit in game_map[x, y]:
+                if unit.player_index not in (0, 1):
+                    continue
+                unit = copy.copy(unit)
+                if not unit.stationary:
+                    self.spawn(unit)
+                    continue
+                self.structures[unit.player_index].setdefault(x * ARENA_SIZE + y, []).append(unit)
+                if unit.damage_i != 0 or unit.damage_f != 0:
+                    self.structure_attackers.append(unit)
+                if unit.shieldRange > 0 and (unit.shieldPerUnit or unit.shieldBonusPerY):
+                    self.supports.append(unit)
+
+    def spawn(self, unit):
+        """
+        Adds a mobile unit to the simulation, targeting the edge opposite its location.
+        """
+        location = [unit.x, unit.y]
+        game_state = self.game_state
+        if not game_state.game_map.in_arena_bounds(location) or (self.blocked_bits >> (unit.x * ARENA_SIZE + unit.y)) & 1:
+            game_state.warn("Could not simulate a {} at {}, the location is blocked or not on the board".format(unit.unit_type, location))
+            return
+        edge = game_state.get_target_edge(location)
+        if edge not in self.edges:
+            end_points = game_state.game_map.get_edge_locations(edge)
+            self.edges[edge] = (end_points, frozenset(x * ARENA_SIZE + y for x, y in end_points))
+        self.simulated.append(_MobileUnit(unit, *self.edges[edge]))
+        self.mobile_units[unit.player_index].setdefault(unit.x * ARENA_SIZE + unit.y, []).append(unit)
+
+    def run(self, max_frames):
+        frame = 0
+        while self.simulated and frame < max_frames:
+            self.shield()
+            if frame > 0:
+                self.move(frame)
+            self.attack()
+            self.remove_destroyed()
+            frame += 1
+        return {
+            "frames": frame,
+            "health_delta": self.health_delta,
+            "resource_delta": [{"SP": self.sp_delta[0]}, {"SP": self.sp_delta[1]}],
+            "structure_damage": self.structure_damage,
+            "destroyed_structures": self.destroyed_structures,
+            "breaches": self.breaches,
+        }
+
+    def shield(self):
+        for support in self.supports:
+            in_range = None
+            for mobile_unit in self.simulated:
+                unit = mobile_unit.unit
+                if unit.player_index != support.player_index or support in mobile_unit.shielded_by:
+                    continue
+                if in_range is None:
+                    in_range = set(locations_in_range(support.x, support.y, support.shieldRange, self.get_hit_radius))
+                if (unit.x, unit.y) in in_range:
+                    forward_y = support.y if support.player_index == 0 else ARENA_SIZE - 1 - support.y
+                    unit.health += support.shieldPerUnit + support.shieldBonusPerY * forward_y
+                    mobile_unit.shielded_by.add(support)
+
+    def move(self, frame):
+        for mobile_unit in list(self.simulated):
+            if not mobile_unit.frames_per_move or frame % mobile_unit.frames_per_move:
+                continue
+            unit = mobile_unit.unit
+            if mobile_unit.layout != self.blocked_bits:
+                mobile_unit.path = self.game_state._shortest_path_finder.navigate_multiple_endpoints(
+                    [unit.x, unit.y], mobile_unit.end_points, self.game_state, self.blocked_bits)
+                mobile_unit.step = 0
+                mobile_unit.layout = self.blocked_bits
+            units_by_cell = self.mobile_units[unit.player_index]
+            self.__remove_from_cell(units_by_cell, unit)
+            if mobile_unit.step + 1 >= len(mobile_unit.path):
+                self.self_destruct(mobile_unit)
+                self.simulated.remove(mobile_unit)
+                continue
+            mobile_unit.step += 1
+            mobile_unit.moves += 1
+            unit.x, unit.y = mobile_unit.path[mobile_unit.step]
+            flat = unit.x * ARENA_SIZE + unit.y
+            if flat in mobile_unit.end_flats:
+                information = self.unit_information[unit.unit_type]
+                breach_damage = information.get("playerBreachDamage", 1)
+                self.health_delta[1 - unit.player_index] -= breach_damage
+                self.sp_delta[unit.player_index] += information.get("metalForBreach", breach_damage * self.cores_per_damage)
+                self.breaches.append([[unit.x, unit.y], unit.unit_type, unit.player_index])
+                self.simulated.remove(mobile_unit)
+                continue
+            units_by_cell.setdefault(flat, []).append(unit)
+
+    def self_destruct(self, mobile_unit):
+        """
+        Damages the enemy units around a unit that can not reach its edge, if it moved far enough.
+        """
+        unit = mobile_unit.unit
+        information = self.unit_information[unit.unit_type]
+        if mobile_unit.moves < information.get("selfDestructStepsRequired", 0):
+            return
+        walker_damage = information.get("selfDestructDamageWalker", 0)
+        tower_damage = information.get("selfDestructDamageTower", 0)
+        enemy_index = 1 - unit.player_index
+        for x, y in locations_in_range(unit.x, unit.y, information.get("selfDestructRange", 0), self.get_hit_radius):
+            flat = x * ARENA_SIZE + y
+            for target in self.mobile_units[enemy_index].get(flat, ()):
+                self.damage(target, walker_damage)
+            for target in self.structures[enemy_index].get(flat, ()):
+                self.damage(target, tower_damage)
+
+    def attack(self):
+        # Units destroyed by self destructs while moving are removed first, attacks within the frame are simultaneous
+        self.remove_destroyed()
+        hits = []
+        for attacker in self.structure_attackers + [mobile_unit.unit for mobile_unit in self.simulated]:
+            enemy_index = 1 - attacker.player_index
+            target = find_target(attacker.x, attacker.y, attacker.player_index, attacker.attackRange, attacker.damage_i,
+                attacker.damage_f, (self.mobile_units[enemy_index], self.structures[enemy_index]), self.get_hit_radius)
+            if target is not None:
+                hits.append((target, attacker.damage_f if target.stationary else attacker.damage_i))
+        for target, damage in hits:
+            self.damage(target, damage)
+
+    def damage(self, unit, damage):
+        if unit.stationary and unit.health > 0:
+            self.structure_damage[unit.player_index] += min(damage, unit.health)
+            if unit.health <= damage:
+                self.dying_structures.append(unit)
+        unit.health -= damage
+
+    def remove_destroyed(self):
+        for mobile_unit in list(self.simulated):
+            unit = mobile_unit.unit
+            if unit.health <= 0:
+                self.__remove_from_cell(self.mobile_units[unit.player_index], unit)
+                self.simulated.remove(mobile_unit)
+        for unit in self.dying_structures:
+            flat = unit.x * ARENA_SIZE + unit.y
+            del self.structures[unit.player_index][flat]
+            self.destroyed_structures.append(unit)
+            self.blocked_bits &= ~(1 << flat)
+            if unit in self.structure_attackers:
+                self.structure_attackers.remove(unit)
+            if unit in self.supports:
+                self.supports.remove(unit)
+        self.dying_structures = []
+
+    def __remove_from_cell(self, units_by_cell, unit):
+        flat = unit.x * ARENA_SIZE + unit.y
+        units = units_by_cell[flat]
+        units.remove(unit)
+        if not units:
+            del units_by_cell[flat]
@@ -1,7 +1,16 @@
 import unittest
 import json
+import copy
+import pickle
 from .game_state import GameState
-from .unit import GameUnit
+from .unit import GameUnit, get_unit_prototype
+from .util import GameMessage, parse_message, load_json
+from .navigation import ShortestPathFinder
+from .simulation import simulate, _ActionPhase
+from .unit_table import UnitTable
+from .rollout_pool import RolloutPool
+from .wavefront import HAVE_NUMPY
+from .game_map import CELL_INDEX, HALF_BITS, range_stencil, popcount, bits_to_locations, location_bit, locations_to_bits, expand_bits, range_bits
 
 class BasicTests(unittest.TestCase):
 
@@ -240,6 +249,18 @@ class BasicTests(unittest.TestCase):
         self.assertEqual(1, len(game.game_map.get_locations_in_range([13,13], 0)), "We should be in 0 range of ourself")
         self.assertEqual(37, len(game.game_map.get_locations_in_range([13,13], 3.5)), "Wrong number of tiles in range")
 
+    def test_range_stencils(self):
+        game = self.make_turn_0_map()
+        game_map = game.game_map
+        self.assertIs(range_stencil(3.5, 0.01), range_stencil(3.5, 0.01), "Stencils should be built once")
+        self.assertEqual(sorted(game_map.get_locations_in_range([13.0, 13.0], 3.5)), sorted(game_map.get_locations_in_range([13, 13], 3.5)), "Stencil lookup does not match a full scan")
+        self.assertEqual(3, len(game_map.get_locations_in_range([0, 13], 1)), "Range should be clipped to the board")
+        centers = [[13, 13], [0, 13], [27, 14], [13.5, 13], [13, 13]]
+        self.assertEqual([game_map.get_locations_in_range(center, 2.5) for center in centers], game_map.get_locations_in_range_batch(centers, 2.5), "Batched ranges do not match")
+        for step in range(200):
+            game_map.get_locations_in_range([13, 13], step / 10)
+        self.assertLessEqual(range_stencil.cache_info().currsize, range_stencil.cache_info().maxsize, "Stencil caches should be bounded")
+
     def _test_get_attackers(self):
         game = self.make_turn_0_map()
         
@@ -256,6 +277,540 @@ class BasicTests(unittest.TestCase):
         game.game_map.add_unit("DF", [14,14], 1)
         self.assertEqual(3, len(game.get_attackers([13,13], 0)), "We should be in danger from 3 places")
 
+    def test_structure_arrays(self):
+        game = self.make_turn_0_map()
+        game_map = game.game_map
+        self.assertEqual(420, sum(1 for x in range(28) for y in range(28) if game_map.in_arena_bounds([x, y])), "The board should have 420 cells")
+        self.assertEqual(False, game_map.in_arena_bounds([-1, 13]), "Negative coordinates should be out of bounds")
+        index = CELL_INDEX[13 * 28 + 5]
+        self.assertEqual(-1, game_map.structure_type[index], "An empty cell should have no structure type")
+        game_map.add_unit("DF", [13, 5], 0)
+        self.assertEqual(2, game_map.structure_type[index], "Structure type was not recorded")
+        self.assertEqual(0, game_map.structure_owner[index], "Structure owner was not recorded")
+        self.assertEqual(90.0, game_map.structure_health[index], "Structure health was not recorded")
+        game_map.add_unit("PI", [13, 5], 0)
+        self.assertEqual(game_map[13, 5], game_map.units_at(13, 5), "The unchecked accessor should match game_map[x, y]")
+        self.assertEqual(game_map[13, 5][0], game.contains_stationary_unit([13, 5]), "The structure should be found")
+        game.attempt_upgrade([13, 5])
+        self.assertEqual(True, game_map.structure_upgraded[index], "Upgrade was not recorded")
+        game_map.remove_unit([13, 5])
+        self.assertEqual(-1, game_map.structure_type[index], "Removed structure is still recorded")
+        self.assertEqual(False, game.contains_stationary_unit([13, 5]), "Removed structure is still found")
+
+    def test_edges(self):
+        game = self.make_turn_0_map()
+        game_map = game.game_map
+        self.assertEqual([[13, 0], [12, 1]], game_map.get_edge_locations(game_map.BOTTOM_LEFT)[:2], "Bottom left edge is wrong")
+        game_map.get_edge_locations(game_map.BOTTOM_LEFT).pop()
+        self.assertEqual(14, len(game_map.get_edges()[game_map.BOTTOM_LEFT]), "Edge lists should not be shared between calls")
+        self.assertEqual(True, game_map.is_friendly_spawn_edge([27, 13]), "[27, 13] is on the bottom right edge")
+        self.assertEqual(True, game_map.is_friendly_spawn_edge((0, 13)), "(0, 13) is on the bottom left edge")
+        self.assertEqual(False, game_map.is_friendly_spawn_edge([13, 1]), "[13, 1] is not on an edge")
+        self.assertEqual(True, game_map.is_enemy_spawn_edge([14, 27]), "[14, 27] is on the top right edge")
+        self.assertEqual(True, game_map.is_on_edge([0, 14], game_map.TOP_LEFT), "[0, 14] is on the top left edge")
+        self.assertEqual(False, game.can_spawn("PI", [13, 1]), "Mobile units should only spawn on our edges")
+
+    def test_iteration(self):
+        game = self.make_turn_0_map()
+        game_map = game.game_map
+        locations = list(game_map)
+        self.assertEqual(420, len(locations), "Iteration should visit every cell once")
+        self.assertEqual([13, 0], locations[0], "Iteration should start at the bottom")
+        self.assertEqual([14, 27], locations[-1], "Iteration should end at the top")
+        nested = sum(1 for _ in game_map for _ in game_map)
+        self.assertEqual(420 * 420, nested, "Nested iterations should not interfere")
+        self.assertEqual(locations[:2], [next(game_map), next(game_map)], "next should still walk the map")
+        iter(game_map)
+        self.assertEqual(locations[0], next(game_map), "iter should start next over")
+        self.assertEqual(locations[1:], [next(game_map) for _ in locations[1:]])
+        self.assertRaises(StopIteration, next, game_map)
+        self.assertEqual(210, len(list(game_map.iter_locations(player_index=1))), "Each player has 210 cells")
+        self.assertEqual(list(game_map.iter_locations(player_index=0)), locations[:210], "Player 0 owns the bottom half")
+        self.assertEqual(2 + 4, len(list(game_map.iter_locations(rows=[0, 1]))), "The bottom two rows have 6 cells")
+        game_map.add_unit("FF", [13, 1], 0)
+        game_map.add_unit("PI", [13, 0], 0)
+        self.assertEqual([[13, 0], [13, 1]], list(game_map.iter_locations(occupied_only=True)), "Wrong occupied cells")
+        self.assertEqual([[13, 1]], list(game_map.iter_locations(structures_only=True)), "Wrong structure cells")
+        self.assertEqual([], list(game_map.iter_locations(player_index=1, structures_only=True)), "No structures on the enemy half")
+
+    def test_fork(self):
+        game = self.make_turn_0_map()
+        game.attempt_spawn("DF", [13, 6])
+        game.game_map.add_unit("PI", [13, 0], 0)
+        fork = game.fork()
+        self.assertIs(game.game_map.structure_at(13, 6), fork.game_map.structure_at(13, 6), "Unchanged units should be shared")
+        self.assertIs(game.config, fork.config, "The config should be shared")
+        fork.attempt_upgrade([13, 6])
+        fork.attempt_spawn("FF", [12, 6])
+        fork.game_map.add_unit("PI", [13, 0], 0)
+        fork.game_map.remove_unit([14, 0])
+        self.assertEqual(False, game.game_map[13, 6][0].upgraded, "Upgrading in a fork changed the original unit")
+        self.assertEqual(True, fork.game_map[13, 6][0].upgraded, "The fork was not upgraded")
+        self.assertEqual(False, game.contains_stationary_unit([12, 6]), "Spawning in a fork changed the original map")
+        self.assertEqual(1, len(game.game_map[13, 0]), "Adding a unit to a fork changed the original cell")
+        self.assertEqual(2, len(fork.game_map[13, 0]), "The unit was not added to the fork")
+        self.assertEqual(23, game.get_resource(game.SP), "Spending in a fork changed the original resources")
+        self.assertEqual(18, fork.get_resource(fork.SP), "The fork did not spend resources")
+        self.assertEqual([("DF", 13, 6)], game._build_stack, "The fork changed the original build stack")
+        self.assertEqual([("DF", 13, 6), ("UP", 13, 6), ("FF", 12, 6)], fork._build_stack, "Wrong build stack in the fork")
+        game.attempt_spawn("FF", [11, 6])
+        self.assertEqual(False, fork.contains_stationary_unit([11, 6]), "Changes to the original leaked into the fork")
+
+    def test_cell_changed_in_place(self):
+        game = self.make_turn_0_map()
+        game_map = game.game_map
+        wall = GameUnit("FF", game.config, 0, None, 13, 5)
+        game_map[13, 5].append(wall)
+        self.assertIs(wall, game.contains_stationary_unit([13, 5]), "An appended structure was not indexed")
+        self.assertEqual(1, game_map.count_units(0, "FF"), "An appended structure was not counted")
+        self.assertIn([13, 5], game_map.get_structure_locations(0), "An appended structure was not listed")
+        fork = game.fork()
+        fork.game_map[13, 5].pop()
+        self.assertEqual(False, fork.contains_stationary_unit([13, 5]), "A structure popped in a fork was not unindexed")
+        self.assertIs(wall, game.contains_stationary_unit([13, 5]), "Popping in a fork changed the original map")
+        self.assertEqual([wall], game_map[13, 5], "Popping in a fork changed the original cell")
+        game.begin()
+        game_map[13, 5].remove(wall)
+        self.assertEqual(False, game.contains_stationary_unit([13, 5]), "A removed structure was not unindexed")
+        game.rollback()
+        self.assertIs(wall, game.contains_stationary_unit([13, 5]), "Rollback did not undo the in place removal")
+        self.assertEqual([wall], game_map[13, 5], "Rollback did not restore the cell")
+        game_map[13, 5].clear()
+        self.assertEqual(0, game_map.count_units(0, "FF"), "A cleared structure was still counted")
+        self.assertEqual([], copy.deepcopy(game_map[13, 5]), "A cell should copy like a list")
+
+    def test_rollback(self):
+        game = self.make_turn_0_map()
+        game.attempt_spawn("DF", [13, 6])
+        original_turret = game.game_map[13, 6][0]
+        game.begin()
+        game.attempt_upgrade([13, 6])
+        game.attempt_spawn("FF", [12, 6])
+        game.begin()
+        game.attempt_spawn("PI", [13, 0], 2)
+        game.game_map.remove_unit([12, 6])
+        game.rollback()
+        self.assertEqual(False, game.contains_stationary_unit([13, 0]), "Inner rollback did not undo the spawn")
+        self.assertEqual("FF", game.contains_stationary_unit([12, 6]).unit_type, "Inner rollback did not undo the removal")
+        self.assertEqual(0, len(game.game_map[13, 0]), "Inner rollback did not undo the mobile units")
+        self.assertEqual(5, game.get_resource(game.MP), "Inner rollback did not refund MP")
+        self.assertEqual([], game._deploy_stack, "Inner rollback did not undo the deploy stack")
+        self.assertEqual(18, game.get_resource(game.SP), "Inner rollback undid too much")
+        game.rollback()
+        self.assertIs(original_turret, game.game_map[13, 6][0], "Rollback did not restore the original unit")
+        self.assertEqual(False, original_turret.upgraded, "Upgrading in a transaction changed the original unit")
+        self.assertEqual(False, game.game_map.structure_upgraded[CELL_INDEX[13 * 28 + 6]], "Rollback did not restore the structure arrays")
+        self.assertEqual(23, game.get_resource(game.SP), "Rollback did not refund SP")
+        self.assertEqual([("DF", 13, 6)], game._build_stack, "Rollback did not undo the build stack")
+        game.begin()
+        game.attempt_spawn("FF", [12, 6])
+        game.commit()
+        self.assertEqual("FF", game.contains_stationary_unit([12, 6]).unit_type, "Commit did not keep the spawn")
+        self.assertEqual([("DF", 13, 6), ("FF", 12, 6)], game._build_stack, "Commit did not keep the build stack")
+
+    def test_unit_indexes(self):
+        game = self.make_turn_0_map()
+        game_map = game.game_map
+        game_map.add_unit("DF", [13, 20], 1)
+        game_map.add_unit("DF", [14, 20], 1)
+        game_map.add_unit("FF", [13, 12], 0)
+        game_map.add_unit("FF", [13, 11], 0)
+        game_map.add_unit("PI", [13, 0], 0)
+        game_map.add_unit("PI", [13, 0], 0)
+        game.attempt_upgrade([13, 11])
+        game_map._upgrade_unit(game_map[14, 20][0])
+        self.assertEqual([[13, 20]], game_map.get_structure_locations(1, "DF", False), "Wrong enemy turrets")
+        self.assertEqual([[14, 20]], game_map.get_structure_locations(1, "DF", True), "Wrong upgraded enemy turrets")
+        self.assertEqual(2, game_map.count_units(0, "FF", rows=[11, 13]), "Wrong number of walls in rows 11 to 13")
+        self.assertEqual(1, game_map.count_units(0, "FF", rows=[12, 13]), "Wrong number of walls in rows 12 to 13")
+        self.assertEqual(2, game_map.count_units(0, "PI"), "Wrong number of mobile units")
+        self.assertEqual([[13, 0]], game_map.get_mobile_unit_locations(0), "Wrong mobile unit locations")
+        for rows in ([30, 40], [-5, -2], [13, 11]):
+            self.assertEqual(0, game_map.count_units(rows=rows), "Bands off the board should be empty, got {}".format(rows))
+            self.assertEqual([], game_map.get_structure_locations(rows=rows))
+            self.assertEqual([], game_map.get_mobile_unit_locations(rows=rows))
+            self.assertEqual(list(game_map.iter_locations(rows=rows)), [])
+        self.assertEqual([[13, 20], [14, 20]], game_map.get_structure_locations(rows=[20, 40]), "Bands should be clamped to the board")
+        self.assertEqual(2, game_map.count_units(0, "PI", rows=[-3, 0]))
+        fork = game.fork()
+        fork.game_map.remove_unit([13, 20])
+        fork.game_map.remove_unit([13, 0])
+        self.assertEqual(0, fork.game_map.count_units(1, "DF", False), "The fork index was not updated")
+        self.assertEqual(1, game_map.count_units(1, "DF", False), "Changing a fork changed the original index")
+        self.assertEqual(2, game_map.count_units(0, "PI"), "Changing a fork changed the original mobile index")
+        game.begin()
+        game_map.remove_unit([13, 12])
+        self.assertEqual(1, game_map.count_units(0, "FF"), "The index was not updated in a transaction")
+        game.rollback()
+        self.assertEqual(2, game_map.count_units(0, "FF"), "Rollback did not restore the index")
+
+    def test_board_hash(self):
+        first = self.make_turn_0_map()
+        second = self.make_turn_0_map()
+        self.assertEqual(0, first.get_board_hash(), "An empty board should hash to 0")
+        first.attempt_spawn("DF", [13, 6])
+        first.attempt_spawn("FF", [12, 6])
+        first.attempt_upgrade([13, 6])
+        second.attempt_spawn("FF", [12, 6])
+        second.attempt_spawn("DF", [13, 6])
+        second.attempt_upgrade([13, 6])
+        self.assertEqual(first.get_board_hash(), second.get_board_hash(), "The same layout should have the same hash")
+        second.game_map.remove_unit([13, 6])
+        second.game_map.add_unit("FF", [13, 6], 1)
+        self.assertNotEqual(first.get_board_hash(), second.get_board_hash(), "Different layouts should have different hashes")
+        self.assertEqual(first.get_blocked_hash(), second.get_blocked_hash(), "The same blocked cells should have the same blocked hash")
+        fork = first.fork()
+        fork.game_map.remove_unit([12, 6])
+        self.assertNotEqual(first.get_blocked_hash(), fork.get_blocked_hash(), "Removing a structure should change the blocked hash")
+        fork.game_map.add_unit("FF", [12, 6], 0)
+        self.assertEqual(first.get_board_hash(), fork.get_board_hash(), "Restoring a structure should restore the hash")
+
+    def test_bitboards(self):
+        game = self.make_turn_0_map()
+        game_map = game.game_map
+        game_map.add_unit("FF", [13, 20], 1)
+        game_map.add_unit("DF", [14, 20], 1)
+        game_map.add_unit("FF", [13, 6], 0)
+        game_map.add_unit("PI", [13, 0], 0)
+        self.assertEqual(3, popcount(game_map.blocked_bits), "There should be 3 blocked cells")
+        self.assertEqual([[13, 20]], bits_to_locations(game_map.get_structure_bits(1, "FF")), "Wrong enemy walls")
+        self.assertEqual(2, popcount(game_map.get_structure_bits(player_index=1)), "Wrong enemy structures")
+        self.assertEqual(210, popcount(HALF_BITS[0]), "Each half should have 210 cells")
+        self.assertEqual(0, HALF_BITS[0] & HALF_BITS[1], "The halves should not overlap")
+        neighbours = expand_bits(location_bit([13, 20])) & ~location_bit([13, 20])
+        self.assertEqual([[12, 20], [13, 19], [13, 21], [14, 20]], bits_to_locations(neighbours), "Wrong neighbours")
+        self.assertEqual([[0, 13], [0, 14], [1, 13]], bits_to_locations(expand_bits(location_bit([0, 13]))), "Expansion should stay on the board")
+        self.assertEqual(sorted(game_map.get_locations_in_range([14, 0], 3.5)), bits_to_locations(range_bits(location_bit([14, 0]), 3.5, 0.01)), "range_bits should match get_locations_in_range")
+        fork = game.fork()
+        fork.game_map.remove_unit([13, 6])
+        self.assertEqual(2, popcount(fork.game_map.blocked_bits), "The fork bitboard was not updated")
+        self.assertEqual(location_bit([13, 6]), game_map.get_structure_bits(0), "Changing a fork changed the original bitboard")
+
+    def test_pathfinder_reuse(self):
+        game = self.make_turn_0_map()
+        path = game.find_path_to_edge([13, 0])
+        self.assertEqual([13, 0], path[0], "Paths should start at the start location")
+        self.assertIn(path[-1], game.game_map.get_edge_locations(game.game_map.TOP_RIGHT), "The path should reach the top right edge")
+        self.assertEqual(path, game.find_path_to_edge([13, 0]), "Reusing the path finder changed the path")
+        for x in range(0, 28):
+            game.game_map.add_unit("FF", [x, 14], 1)
+        blocked_path = game.find_path_to_edge([13, 0])
+        self.assertNotIn(blocked_path[-1], game.game_map.get_edge_locations(game.game_map.TOP_RIGHT), "The path should self destruct")
+        for x in range(0, 28):
+            game.game_map.remove_unit([x, 14])
+        self.assertEqual(path, game.find_path_to_edge([13, 0]), "The path finder did not notice removed structures")
+        path_finder = game._shortest_path_finder
+        end_points = game.game_map.get_edge_locations(game.game_map.TOP_RIGHT)
+        move_direction = 0
+        for current, expected in zip(path, path[1:]):
+            self.assertEqual(expected, path_finder._choose_next_move(current, move_direction, end_points), "_choose_next_move does not match the path")
+            move_direction = path_finder.VERTICAL if current[0] == expected[0] else path_finder.HORIZONTAL
+
+    def test_changed_end_points(self):
+        game = self.make_turn_0_map()
+        path_finder = game._shortest_path_finder
+        end_points = game.game_map.get_edge_locations(game.game_map.TOP_RIGHT)
+        path = path_finder.navigate_multiple_endpoints([13, 0], end_points, game)
+        self.assertIn(path[-1], end_points)
+        end_points[:] = [[0, 13], [1, 14]]
+        expected = ShortestPathFinder().navigate_multiple_endpoints([13, 0], [[0, 13], [1, 14]], game)
+        self.assertEqual(expected, path_finder.navigate_multiple_endpoints([13, 0], end_points, game), "End points changed in place should be noticed")
+
+    def test_batch_paths(self):
+        game = self.make_turn_0_map()
+        for x in range(0, 27):
+            game.game_map.add_unit("FF", [x, 10], 0)
+        game.game_map.add_unit("FF", [13, 0], 0)
+        starts = game.game_map.get_edge_locations(game.game_map.BOTTOM_LEFT) + game.game_map.get_edge_locations(game.game_map.BOTTOM_RIGHT)
+        expected = [game.find_path_to_edge(start) for start in starts]
+        self.assertEqual(expected, game.find_paths_to_edge_batch(starts), "Batch paths should match single paths")
+        self.assertIsNone(game.find_paths_to_edge_batch([[13, 0]])[0], "Blocked starts should get no path")
+        self.assertEqual(expected[:3], game.find_paths_to_edge_batch(starts[:3], game.game_map.TOP_RIGHT), "Batch paths should respect the target edge")
+
+    def test_path_cache(self):
+        game = self.make_turn_0_map()
+        path = game.find_path_to_edge([13, 0])
+        self.assertEqual(1, game.get_path_cache_info()["misses"], "The first search should miss the cache")
+        path[1][0] = -1
+        self.assertEqual(game.find_path_to_edge([13, 0])[1], [13, 1], "Cached paths should not share lists with returned paths")
+        self.assertEqual(1, game.get_path_cache_info()["hits"], "The repeated search should hit the cache")
+        game.attempt_spawn("FF", [13, 1])
+        self.assertNotIn([13, 1], game.find_path_to_edge([13, 0]), "Placing a structure should invalidate cached paths")
+        game.attempt_remove([13, 1])
+        game.game_map.remove_unit([13, 1])
+        self.assertEqual(game.find_path_to_edge([13, 0])[1], [13, 1], "Removing a structure should invalidate cached paths")
+        self.assertEqual(2, game.get_path_cache_info()["hits"], "The original layout should still be cached")
+
+    def test_distance_field_repair(self):
+        game = self.make_turn_0_map()
+        repaired = ShortestPathFinder(path_cache_size=0)
+        searched = ShortestPathFinder(path_cache_size=0, max_field_repairs=0)
+        end_points = game.game_map.get_edge_locations(game.game_map.TOP_RIGHT)
+        locations = [[x, 13] for x in range(1, 27)] + [[13, 5], [12, 6], [14, 6], [0, 13], [13, 5]]
+        for location in locations:
+            if game.contains_stationary_unit(location):
+                game.game_map.remove_unit(location)
+            else:
+                game.game_map.add_unit("FF", location, 0)
+            path = searched.navigate_multiple_endpoints([13, 0], end_points, game)
+            self.assertEqual(path, repaired.navigate_multiple_endpoints([13, 0], end_points, game), "Repaired paths should match searched paths")
+            for x, y in game.game_map:
+                self.assertEqual(searched._get_pathlength([x, y]), repaired._get_pathlength([x, y]), "Repaired distances should match searched distances")
+
+    def test_layout_paths(self):
+        game = self.make_turn_0_map()
+        walls = [[[x, 10] for x in range(0, 27)], [[13, 1]], [[x, 8] for x in range(0, 28)], [[14, 0]]]
+        layouts = [game.game_map.blocked_bits | locations_to_bits(locations) for locations in walls]
+        expected = []
+        for locations in walls:
+            layout_game = game.fork()
+            for location in locations:
+                layout_game.game_map.add_unit("FF", location, 0)
+            expected.append(layout_game.find_path_to_edge([13, 0], game.game_map.TOP_RIGHT))
+        self.assertEqual(expected, game.find_path_to_edge_layouts([13, 0], layouts), "Layout paths should match paths on the same map")
+        if HAVE_NUMPY:
+            numpy_paths = game._shortest_path_finder.navigate_multiple_layouts([13, 0], game.game_map.get_edge_locations(game.game_map.TOP_RIGHT), layouts, game, use_numpy=True)
+            self.assertEqual(expected, numpy_paths, "NumPy layout paths should match paths on the same map")
+        self.assertEqual([], game.game_map.get_structure_locations(), "Layout paths should not change the map")
+
+    def test_can_reach_edge(self):
+        game = self.make_turn_0_map()
+        self.assertTrue(game.can_reach_edge([13, 0]), "An empty map should not block the edge")
+        for x in range(0, 28):
+            game.game_map.add_unit("FF", [x, 13], 0)
+        self.assertFalse(game.can_reach_edge([13, 0]), "A full wall should block the edge")
+        self.assertTrue(game.can_reach_edge([0, 14], game.game_map.TOP_LEFT), "Units above the wall should reach the top edges")
+        self.assertFalse(game.can_reach_edge([5, 13]), "Blocked starts cannot reach the edge")
+        path = game.find_path_to_edge([13, 0])
+        self.assertEqual(path, game.find_path_to_edge([13, 0]), "Paths from labelled pockets should not change")
+        self.assertEqual([26, 12], path[-1], "Self destruct paths should end at the most ideal tile of the pocket")
+        game.game_map.remove_unit([20, 13])
+        self.assertTrue(game.can_reach_edge([13, 0]), "Opening the wall should unblock the edge")
+
+    def test_overlay_paths(self):
+        game = self.make_turn_0_map()
+        for x in range(0, 28):
+            game.game_map.add_unit("FF", [x, 13], 0)
+        walls = [[x, 10] for x in range(0, 27)]
+        hypothetical = game.fork()
+        for location in walls:
+            hypothetical.game_map.add_unit("FF", location, 0)
+        hypothetical.game_map.remove_unit([20, 13])
+        expected = hypothetical.find_path_to_edge([13, 0])
+        blocked_bits = game.game_map.blocked_bits
+        self.assertEqual(expected, game.find_path_to_edge([13, 0], extra_blocked=walls, unblocked=[[20, 13]]), "Overlay paths should match paths on a changed map")
+        self.assertEqual(expected, game.find_path_to_edge([13, 0], extra_blocked=locations_to_bits(walls), unblocked=location_bit([20, 13])), "Overlays should accept bitboards")
+        self.assertEqual(blocked_bits, game.game_map.blocked_bits, "Overlay paths should not change the map")
+        self.assertNotEqual(expected, game.find_path_to_edge([13, 0]), "Paths without an overlay should use the map")
+        starts = [[13, 0], [14, 0], [5, 13], [20, 13]]
+        paths = game.find_paths_to_edge_batch(starts, extra_blocked=walls, unblocked=[[20, 13]])
+        self.assertEqual([hypothetical.find_path_to_edge(start) for start in starts], paths, "Batched overlay paths should match paths on a changed map")
+        self.assertIsNone(paths[2], "Blocked starts should get no path")
+
+    def test_attack_coverage(self):
+        game = self.make_turn_0_map()
+        game.game_map.add_unit("DF", [13, 16], 1)
+        game.game_map.add_unit("FF", [16, 16], 1)
+        self.assertEqual((1, 5.0, 0), game.game_map.get_attack_coverage([13, 14], 0), "A turret should cover cells in its range")
+        self.assertEqual((0, 0, 0), game.game_map.get_attack_coverage([13, 13], 0), "Upgraded range should not apply before the upgrade")
+        self.assertEqual((0, 0, 0), game.game_map.get_attack_coverage([13, 14], 1), "Structures should not attack their own player")
+        game.game_map._upgrade_unit(game.game_map[13, 16][0])
+        self.assertEqual((1, 15.0, 0), game.game_map.get_attack_coverage([13, 13], 0), "Upgrades should update range and damage")
+        self.assertEqual(game.game_map[13, 16], game.get_attackers([13, 13], 0), "get_attackers should use the coverage index")
+        fork = game.fork()
+        fork.game_map.remove_unit([13, 16])
+        self.assertEqual((0, 0, 0), fork.game_map.get_attack_coverage([13, 13], 0), "Removing a structure should uncover its cells")
+        self.assertEqual((1, 15.0, 0), game.game_map.get_attack_coverage([13, 13], 0), "Forks should not change the coverage of the original")
+        game.game_map.add_unit("PI", [13, 12], 1)
+        self.assertEqual(2, len(game.get_attackers([13, 13], 0)), "Mobile attackers should still be found")
+
+    def test_path_damage_profile(self):
+        game = self.make_turn_0_map()
+        game.game_map.add_unit("DF", [13, 16], 1)
+        path = [[13, 12], [13, 13], [13, 14], [14, 14]]
+        profile = game.get_path_damage_profile(path)
+        self.assertEqual([0, 0, 5.0, 5.0], profile["PI"]["damage_per_frame"], "Scouts should spend one frame on each location")
+        self.assertEqual([0, 0, 0, 0, 5.0, 5.0, 5.0, 5.0], profile["EI"]["damage_per_frame"], "Demolishers should spend two frames on each location")
+        self.assertEqual(16, len(profile["SI"]["damage_per_frame"]), "Interceptors should spend four frames on each location")
+        self.assertEqual(10.0, profile["PI"]["total_damage"])
+        self.assertIsNone(profile["PI"]["destroyed_frame"], "Scouts should survive 10 damage")
+        self.assertEqual(4, profile["EI"]["destroyed_frame"], "Demolishers should be destroyed by the first hit")
+        game.game_map._upgrade_unit(game.game_map[13, 16][0])
+        profiles = game.get_paths_damage_profile([path, None], unit_types=["PI"])
+        self.assertEqual([0, 15.0, 15.0, 15.0], profiles[0]["PI"]["damage_per_frame"], "Upgraded turrets should hit harder and further")
+        self.assertEqual(1, profiles[0]["PI"]["destroyed_frame"], "Scouts should be destroyed once 15 damage is taken")
+        self.assertIsNone(profiles[1], "Missing paths should have no profile")
+        if HAVE_NUMPY:
+            paths = [path, None, [], path[::-1]]
+            self.assertEqual(game.get_paths_damage_profile(paths, use_numpy=False), game.get_paths_damage_profile(paths, use_numpy=True),
+                "Profiling with NumPy should give the same profiles")
+
+    def test_lazy_parsing(self):
+        config = self.make_turn_0_map().config
+        units = """[[[13,6,60.0,"1"]],[],[[14,6,75.0,"2"]],[[13,0,15.0,"3"],[13,0,15.0,"4"]],[],[],[[14,6,0,"5"]],[[13,6,0,"6"]]]"""
+        state_string = """{"p2Units":[[],[[13,20,30.0,"7"]],[],[],[],[],[],[]],"turnInfo":[0,5,-1],"p1Stats":[30.0,25.0,5.0,0],"p1Units":%s,"p2Stats":[30.0,25.0,5.0,0],"events":{}}""" % units
+        eager = GameState(config, state_string)
+        lazy = GameState(config, state_string, lazy=True)
+        self.assertFalse(eager._lazy, "Units should be created while parsing unless lazy parsing is asked for")
+        self.assertEqual(eager.get_board_hash(), lazy.get_board_hash(), "The map should be indexed before any unit is created")
+        self.assertEqual([[13, 6], [14, 6], [13, 20]], list(lazy.game_map.iter_locations(structures_only=True)))
+        self.assertEqual(60.0, lazy.game_map.structure_health[CELL_INDEX[13 * 28 + 6]], "Structure arrays should be filled in while parsing")
+        for location in eager.game_map:
+            expected = [(unit.unit_type, unit.player_index, unit.health, unit.upgraded, unit.pending_removal, unit.damage_i) for unit in eager.game_map[location]]
+            got = [(unit.unit_type, unit.player_index, unit.health, unit.upgraded, unit.pending_removal, unit.damage_i) for unit in lazy.game_map[location]]
+            self.assertEqual(expected, got, "Lazy parsing created different units at {}".format(location))
+        self.assertTrue(lazy.game_map[13, 6][0].upgraded, "Upgrades should be applied when the unit is created")
+        self.assertTrue(lazy.game_map[14, 6][0].pending_removal, "Removals should be applied when the unit is created")
+        self.assertIs(lazy.game_map[13, 6][0], lazy.contains_stationary_unit([13, 6]), "Each unit should only be created once")
+
+    def test_parse_message(self):
+        config = self.make_turn_0_map().config
+        state_string = """{"p2Units":[[],[],[[13,16,75.0,"1"]],[],[],[],[],[]],"turnInfo":[0,5,-1],"p1Stats":[30.0,25.0,5.0,0],"p1Units":[[[13,6,60.0,"2"]],[],[],[],[],[],[],[]],"p2Stats":[30.0,25.0,5.0,0],"events":{}}"""
+        state = load_json(state_string)
+        message = GameMessage(state_string, state)
+        self.assertEqual(state_string, message, "A GameMessage should still be the raw string")
+        self.assertIs(state, parse_message(message), "A GameMessage should not be parsed again")
+        self.assertIs(state, parse_message(state), "A parsed message should be returned as is")
+        self.assertEqual(state, parse_message(state_string), "Strings should still be parsed")
+        expected = GameState(config, state_string)
+        for game_state in (GameState(config, message), GameState(config, state)):
+            self.assertEqual(expected.get_board_hash(), game_state.get_board_hash())
+            self.assertEqual(expected.turn_number, game_state.turn_number)
+            self.assertEqual(60.0, game_state.game_map[13, 6][0].health)
+
+        game_state = GameState(config, message)
+        for copied in (copy.copy(message), copy.deepcopy(message), pickle.loads(pickle.dumps(message))):
+            self.assertIsInstance(copied, GameMessage)
+            self.assertEqual(state_string, copied)
+            self.assertEqual(state, copied.parsed, "A copied GameMessage should keep its parsed json")
+        for copied in (copy.deepcopy(game_state), pickle.loads(pickle.dumps(game_state))):
+            self.assertEqual(game_state.get_board_hash(), copied.get_board_hash(), "A GameState from a GameMessage should be copyable")
+            self.assertEqual(60.0, copied.game_map[13, 6][0].health)
+
+    def test_unit_prototypes(self):
+        game = self.make_turn_0_map()
+        game.game_map.add_unit("DF", [13, 6], 0)
+        game.game_map.add_unit("DF", [14, 6], 0)
+        first, second = game.game_map[13, 6][0], game.game_map[14, 6][0]
+        self.assertIs(first.prototype, second.prototype, "Units of the same type should share a prototype")
+        self.assertFalse(hasattr(first, "__dict__"), "Units should only hold their own state")
+        base_cost = first.cost
+        first.upgrade()
+        self.assertTrue(first.upgraded)
+        self.assertFalse(second.upgraded, "Upgrading a unit changed another unit of the same type")
+        self.assertEqual(5.0, second.damage_i)
+        self.assertGreater(first.attackRange, second.attackRange)
+        self.assertGreater(first.cost[0], base_cost[0], "Upgrades should add to the cost")
+        second.upgrade()
+        self.assertIs(first.prototype, second.prototype, "Upgraded units should share a prototype")
+
+        second.damage_i = 100
+        self.assertEqual(100, second.damage_i, "Stats should still be settable on a unit")
+        self.assertNotEqual(100, first.damage_i, "Setting a stat changed another unit of the same type")
+        second.upgraded = False
+        self.assertFalse(second.upgraded)
+        self.assertEqual(100, second.damage_i, "Setting upgraded should only change the flag")
+
+        copied_config = copy.deepcopy(game.config)
+        copied = GameUnit("DF", copied_config)
+        copied.upgrade()
+        self.assertEqual(first.attackRange, copied.attackRange)
+        self.assertIs(first.prototype, get_unit_prototype("DF", game.config, 1), "A second config should not evict the first one's prototypes")
+
+    def test_unit_table(self):
+        config = self.make_turn_0_map().config
+        units = """[[[13,6,60.0,"1"]],[],[[14,6,0,"2"]],[[13,0,15.0,"3"],[13,0,15.0,"4"]],[],[],[[14,6,0,"5"]],[[13,6,0,"6"]]]"""
+        state_string = """{"p2Units":[[],[[13,20,30.0,"7"]],[],[],[],[[12,15,40.0,"8"]],[],[]],"turnInfo":[0,5,-1],"p1Stats":[30.0,25.0,5.0,0],"p1Units":%s,"p2Stats":[30.0,25.0,5.0,0],"events":{}}""" % units
+        game = GameState(config, state_string)
+        table = game.get_unit_table()
+        self.assertIs(table, game.get_unit_table(), "The table should only be built once")
+        self.assertEqual(6, len(table))
+        self.assertEqual(["1", "2", "3", "4", "7", "8"], table.unit_id)
+        self.assertEqual([True, False, False, False, False, False], table.upgraded)
+        self.assertEqual([False, True, False, False, False, False], table.pending_removal)
+        self.assertEqual(game.game_map[14, 6][0].health, table.health[1], "Missing health should default to the unit's start health")
+        health_by_row = table.get_structure_health_by_row(0)
+        self.assertEqual(60.0 + table.health[1], health_by_row[6])
+        self.assertEqual(0, sum(health_by_row) - health_by_row[6])
+        self.assertEqual([2, 3], table.get_units_in_range([13.5, 1], 1.5, player_index=0, mobile_only=True))
+        self.assertEqual([5], table.get_units_in_range([12, 14], 1, mobile_only=True))
+        self.assertEqual([4, 5], table.get_units_in_range([13, 17], 3.5, player_index=1))
+        game.game_map.add_unit("FF", [10, 6], 0)
+        self.assertEqual(6, len(game.get_unit_table()), "The table should be a snapshot of the turn's state")
+        current = UnitTable(config, game.get_serialized_board())
+        self.assertEqual(7, len(current), "A table of the serialized board should include new units")
+        self.assertEqual(1, len(current.get_units_in_range([10, 6], 0.5)))
+        self.assertEqual(sorted(table.upgraded + [False]), sorted(current.upgraded))
+
+    def test_get_targets(self):
+        game = self.make_turn_0_map()
+        game.game_map.add_unit("DF", [13, 12], 0)
+        game.game_map.add_unit("FF", [13, 14], 1)
+        game.game_map.add_unit("FF", [12, 14], 1)
+        game.game_map.add_unit("DF", [15, 15], 1)
+        game.game_map.add_unit("PI", [11, 14], 1)
+        game.game_map.add_unit("PI", [14, 14], 1)
+        game.game_map[14, 14][0].health = 5.0
+        game.game_map.add_unit("EI", [13, 10], 0)
+        attackers = [unit for location in game.game_map for unit in game.game_map[location]]
+        targets = game.get_targets(attackers)
+        self.assertEqual([game.get_target(unit) for unit in attackers], targets, "get_targets should match get_target")
+        turret_target = targets[attackers.index(game.game_map[13, 12][0])]
+        self.assertIs(game.game_map[14, 14][0], turret_target, "Mobile units should be targeted first, then the nearest and weakest")
+        self.assertIsNone(targets[attackers.index(game.game_map[13, 14][0])], "Walls should not have a target")
+        self.assertEqual([None], game.get_targets([GameUnit("DF", game.config, 0, None, 3, 10)]), "Units out of range should not be targeted")
+
+    def test_simulate(self):
+        game = self.make_turn_0_map()
+        game.attempt_spawn("PI", [13, 0], 2)
+        result = simulate(game)
+        self.assertEqual(len(game.find_path_to_edge([13, 0])), result["frames"], "Scouts should take one frame per location")
+        self.assertEqual([0, -2.0], result["health_delta"], "Both scouts should breach")
+        self.assertEqual(2.0, result["resource_delta"][0]["SP"], "Breaches should give SP to the attacker")
+        self.assertEqual([[[27, 14], "PI", 0]] * 2, result["breaches"])
+
+        game = self.make_turn_0_map()
+        game.game_map.add_unit("DF", [13, 2], 1)
+        game.game_map._upgrade_unit(game.game_map[13, 2][0])
+        board_hash = game.get_board_hash()
+        result = simulate(game, [["PI", [13, 0], 2]])
+        self.assertEqual([], result["breaches"], "An upgraded turret should destroy a scout each frame")
+        self.assertEqual(2, result["frames"])
+        self.assertEqual([0, 6.0], result["structure_damage"], "Scouts should attack the turret until they are destroyed")
+        self.assertEqual(90.0, game.game_map[13, 2][0].health, "Simulating should not damage the game state's units")
+        self.assertEqual(board_hash, game.get_board_hash(), "Simulating should not change the game state")
+
+        game = self.make_turn_0_map()
+        game.game_map.add_unit("DF", [13, 12], 0)
+        game.game_map.add_unit("FF", [13, 13], 0)
+        game.game_map.add_unit("PI", [13, 14], 1)
+        action_phase = _ActionPhase(game)
+        scout = action_phase.simulated[0].unit
+        action_phase.damage(scout, 100)
+        action_phase.attack()
+        self.assertEqual(75.0, action_phase.structures[0][13 * 28 + 13][0].health, "Destroyed units should not attack")
+        self.assertEqual(-85.0, scout.health, "Destroyed units should not be targeted")
+        self.assertEqual([], action_phase.simulated)
+        self.assertNotIn("MP", result["resource_delta"][0], "MP does not change during an action phase")
+
+    def test_rollout_pool(self):
+        game = self.make_turn_0_map()
+        game.game_map.add_unit("DF", [13, 2], 1)
+        board = game.get_serialized_board()
+        self.assertEqual(board, GameState(game.config, board).get_serialized_board(), "A serialized board should create the same GameState")
+
+        candidates = [[["PI", [13, 0], 2]], [["PI", [14, 0]]], [["FF", [13, 1]], ["PI", [14, 0], 3]]]
+        in_process = RolloutPool(game.config, processes=0)
+        expected = sorted(in_process.evaluate(game, candidates))
+        self.assertEqual([0, 1, 2], [index for index, _ in expected])
+        self.assertEqual(simulate(game, [["PI", [13, 0], 2]]), expected[0][1], "A candidate should be scored as if its actions were simulated")
+        pool = RolloutPool(game.config, processes=2)
+        try:
+            got = sorted(pool.evaluate(game, candidates))
+        finally:
+            pool.close()
+        self.assertEqual(expected, got, "Scores from worker processes should match scores from this process")
+
     def test_print_unit(self):
         game = self.make_turn_0_map()
 
@@ -274,4 +829,3 @@ class BasicTests(unittest.TestCase):
     def future_turn_testing_function(self, game, expected, turns):
         actual = game.project_future_MP(turns)
         self.assertAlmostEqual(actual, expected, 0, "Expected {} MP {} turns from now, got {}".format(expected, turns, actual))
-
@@ -1,3 +1,7 @@
+from collections import namedtuple
+from operator import attrgetter
+
+
 def is_stationary(unit_type, structure_types):
     """
         Args:
@@ -9,8 +13,123 @@ def is_stationary(unit_type, structure_types):
     return unit_type in structure_types
 
 
+class UnitPrototype(namedtuple("UnitPrototype", [
+        "unit_type", "config", "level", "stationary", "speed", "damage_f", "damage_i", "attackRange", "shieldRange",
+        "max_health", "shieldPerUnit", "shieldBonusPerY", "cost"])):
+    """The stats shared by every unit of one type and upgrade level, compiled once from the config.
+    See GameUnit for the meaning of each stat. level is the number of times the unit has been upgraded.
+    """
+    __slots__ = ()
+
+    @classmethod
+    def from_config(cls, unit_type, config):
+        type_config = config["unitInformation"][_unit_type_indexes(config)[unit_type]]
+        return cls(
+            unit_type, config, 0, type_config.get("unitCategory") == 0,
+            type_config.get("speed", 0),
+            type_config.get("attackDamageTower", 0),
+            type_config.get("attackDamageWalker", 0),
+            type_config.get("attackRange", 0),
+            type_config.get("shieldRange", 0),
+            type_config.get("startHealth", 0),
+            type_config.get("shieldPerUnit", 0),
+            type_config.get("shieldBonusPerY", 0),
+            (type_config.get("cost1", 0), type_config.get("cost2", 0)))
+
+    def upgraded(self):
+        """Compiles the prototype one upgrade level above this one. Costs add up with each upgrade
+        """
+        type_config = self.config["unitInformation"][_unit_type_indexes(self.config)[self.unit_type]].get("upgrade", {})
+        return self._replace(
+            level=self.level + 1,
+            speed=type_config.get("speed", self.speed),
+            damage_f=type_config.get("attackDamageTower", self.damage_f),
+            damage_i=type_config.get("attackDamageWalker", self.damage_i),
+            attackRange=type_config.get("attackRange", self.attackRange),
+            shieldRange=type_config.get("shieldRange", self.shieldRange),
+            max_health=type_config.get("startHealth", self.max_health),
+            shieldPerUnit=type_config.get("shieldPerUnit", self.shieldPerUnit),
+            shieldBonusPerY=type_config.get("shieldBonusPerY", self.shieldBonusPerY),
+            cost=(type_config.get("cost1", 0) + self.cost[0], type_config.get("cost2", 0) + self.cost[1]))
+
+
+def _unit_type_indexes(config):
+    return {unit_information.get("shorthand"): index for index, unit_information in enumerate(config["unitInformation"])}
+
+
+"""
+The prototypes compiled for each config in use, keyed by the config's id, along with the config itself so a
+reused id is not mistaken for it. Games only use one config, a few more are kept for copies of it.
+"""
+_MAX_PROTOTYPE_CONFIGS = 8
+_prototypes_by_config = {}
+
+
+def compile_unit_prototypes(config):
+    """Compiles the base and upgraded prototype of every unit type in a config.
+    Called by AlgoCore when the game starts, GameUnits compile them on first use if it has not been called.
+
+    Args:
+        config: A json object containing information about the game
+
+    Returns:
+        A dict from (unit_type, level) to UnitPrototype
+
+    """
+    prototypes = {}
+    for unit_type in _unit_type_indexes(config):
+        prototype = UnitPrototype.from_config(unit_type, config)
+        prototypes[unit_type, 0] = prototype
+        prototypes[unit_type, 1] = prototype.upgraded()
+    _prototypes_by_config.pop(id(config), None)
+    if len(_prototypes_by_config) >= _MAX_PROTOTYPE_CONFIGS:
+        del _prototypes_by_config[next(iter(_prototypes_by_config))]
+    _prototypes_by_config[id(config)] = (config, prototypes)
+    return prototypes
+
+
+def get_unit_prototype(unit_type, config, level=0):
+    """Gets the shared prototype of a unit type and upgrade level, compiling the config's prototypes if needed
+
+    Args:
+        unit_type: The type of unit
+        config: A json object containing information about the game
+        level: The number of times the unit has been upgraded
+
+    Returns:
+        The UnitPrototype
+
+    """
+    compiled = _prototypes_by_config.get(id(config))
+    prototypes = compiled[1] if compiled is not None and compiled[0] is config else compile_unit_prototypes(config)
+    prototype = prototypes.get((unit_type, level))
+    if prototype is None:
+        prototype = prototypes[unit_type, level - 1].upgraded() if level > 0 else UnitPrototype.from_config(unit_type, config)
+        prototypes[unit_type, level] = prototype
+    return prototype
+
+
+def _stat(name):
+    """
+    A GameUnit attribute read from its prototype. Setting it gives the unit its own copy of the prototype.
+    """
+    def set_stat(self, value):
+        self.prototype = self.prototype._replace(**{name: value})
+    return property(attrgetter("prototype." + name), set_stat)
+
+
+def _set_cost(self, cost):
+    self.prototype = self.prototype._replace(cost=tuple(cost))
+
+
+def _set_upgraded(self, upgraded):
+    # Only the flag changes, like setting it did before units had prototypes. upgrade() also changes the stats
+    self.prototype = self.prototype._replace(level=max(self.prototype.level, 1) if upgraded else 0)
+
+
 class GameUnit:
     """Holds information about a Unit. 
+    The stats of a unit are shared by every unit of its type and upgrade level, in a UnitPrototype.
 
     Attributes :
         * unit_type (string): This unit's type
@@ -30,51 +149,47 @@ class GameUnit:
         * shieldPerUnit (float): how much shield is given per unit
         * pending_removal (boolean): If this unit is marked for removal by its owner
         * upgraded (boolean): If this unit is upgraded
+        * prototype (UnitPrototype): The stats shared with every unit of the same type and upgrade level
+
+    Stats can still be set on a single unit, which then stops sharing its prototype. cost is a new list each
+    time it is read, set it instead of changing it in place. Units have __slots__, so attributes not listed
+    here can not be added to them.
 
     """
+    __slots__ = ("prototype", "player_index", "x", "y", "health", "pending_removal")
+
     def __init__(self, unit_type, config, player_index=None, health=None, x=-1, y=-1):
         """ Initialize unit variables using args passed
 
         """
-        self.unit_type = unit_type
-        self.config = config
+        self.prototype = get_unit_prototype(unit_type, config)
         self.player_index = player_index
         self.pending_removal = False
-        self.upgraded = False
         self.x = x
         self.y = y
-        self.__serialize_type()
-        self.health = self.max_health if not health else health
-
-    def __serialize_type(self):
-        from .game_state import STRUCTURE_TYPES, UNIT_TYPE_TO_INDEX, SUPPORT
-        type_config = self.config["unitInformation"][UNIT_TYPE_TO_INDEX[self.unit_type]]
-        self.stationary = type_config["unitCategory"] == 0
-        self.speed = type_config.get("speed", 0)
-        self.damage_f = type_config.get("attackDamageTower", 0)
-        self.damage_i = type_config.get("attackDamageWalker", 0)
-        self.attackRange = type_config.get("attackRange", 0)
-        self.shieldRange = type_config.get("shieldRange", 0)
-        self.max_health = type_config.get("startHealth", 0)
-        self.shieldPerUnit = type_config.get("shieldPerUnit", 0)
-        self.shieldBonusPerY = type_config.get("shieldBonusPerY", 0)
-        self.cost = [type_config.get("cost1", 0), type_config.get("cost2", 0)]
+        self.health = self.prototype.max_health if not health else health
 
+    unit_type = _stat("unit_type")
+    config = _stat("config")
+    stationary = _stat("stationary")
+    speed = _stat("speed")
+    damage_f = _stat("damage_f")
+    damage_i = _stat("damage_i")
+    attackRange = _stat("attackRange")
+    shieldRange = _stat("shieldRange")
+    max_health = _stat("max_health")
+    shieldPerUnit = _stat("shieldPerUnit")
+    shieldBonusPerY = _stat("shieldBonusPerY")
+    cost = property(lambda self: list(self.prototype.cost), _set_cost)
+    upgraded = property(lambda self: self.prototype.level > 0, _set_upgraded)
 
     def upgrade(self):
-        from .game_state import UNIT_TYPE_TO_INDEX
-        type_config = self.config["unitInformation"][UNIT_TYPE_TO_INDEX[self.unit_type]].get("upgrade", {})
-        self.speed = type_config.get("speed", self.speed)
-        self.damage_f = type_config.get("attackDamageTower", self.damage_f)
-        self.damage_i = type_config.get("attackDamageWalker", self.damage_i)
-        self.attackRange = type_config.get("attackRange", self.attackRange)
-        self.shieldRange = type_config.get("shieldRange", self.shieldRange)
-        self.max_health = type_config.get("startHealth", self.max_health)
-        self.shieldPerUnit = type_config.get("shieldPerUnit", self.shieldPerUnit)
-        self.shieldBonusPerY = type_config.get("shieldBonusPerY", self.shieldBonusPerY)
-        self.cost = [type_config.get("cost1", 0) + self.cost[0], type_config.get("cost2", 0) + self.cost[1]]
-        self.upgraded = True
-
+        prototype = self.prototype
+        if prototype is get_unit_prototype(prototype.unit_type, prototype.config, prototype.level):
+            self.prototype = get_unit_prototype(prototype.unit_type, prototype.config, prototype.level + 1)
+        else:
+            # Stats set on this unit are kept unless the upgrade changes them
+            self.prototype = prototype.upgraded()
 
     def __toString(self):
         owner = "Friendly" if self.player_index == 0 else "Enemy"
@@ -0,0 +1,164 @@
+"""
+A column per attribute for every unit in a serialized game state, for queries over many units at once
+without creating GameUnits. Row i of every column describes the same unit, in the order the units appear
+in p1Units then p2Units.
+
+Columns are lists. When NumPy is installed, get_arrays returns them as arrays, and queries over enough
+units are vectorised. Both give the same results.
+"""
+import math
+from .util import parse_message
+from .wavefront import HAVE_NUMPY, np
+
+_COLUMNS = ("x", "y", "owner", "type_index", "health", "upgraded", "pending_removal", "unit_id")
+
+
+class UnitTable:
+    """Holds the units of a game state as parallel columns.
+    The table is a snapshot of the serialized state. Units spawned, removed or upgraded afterwards, with attempt_spawn,
+    attempt_remove, attempt_upgrade or the GameMap, are not reflected in it.
+
+    Attributes :
+        * x (list of ints): The x coordinate of each unit
+        * y (list of ints): The y coordinate of each unit
+        * owner (list of ints): The player_index of each unit. 0 for you, 1 for your opponent
+        * type_index (list of ints): The index of each unit's type in the config's unitInformation
+        * health (list of floats): The health of each unit
+        * upgraded (list of bools): If each unit is upgraded
+        * pending_removal (list of bools): If each unit is marked for removal by its owner
+        * unit_id (list of strings): The game engine's id of each unit
+        * stationary (list of bools): If each unit's type is a structure
+
+    """
+    min_numpy_units = 64
+
+    def __init__(self, config, serialized_string):
+        """ Fills in the columns from the p1Units and p2Units of a game state
+
+        Args:
+            * config (JSON): A json object containing information about the game
+            * serialized_string (string): The game state, as a json string, a GameMessage or a parsed dict
+
+        """
+        state = parse_message(serialized_string)
+        unit_information = config["unitInformation"]
+        self.__get_hit_radius = unit_information[0].get("getHitRadius", 0)
+        self.__stationary_types = [information.get("unitCategory") == 0 for information in unit_information]
+        self.__start_health = [information.get("startHealth", 0) for information in unit_information]
+        # Removals and upgrades are found by shorthand, read from the config the way GameState reads REMOVE and UPGRADE
+        shorthands = [information.get("shorthand") for information in unit_information]
+        remove, upgrade = unit_information[6]["shorthand"], unit_information[7]["shorthand"]
+        for name in _COLUMNS:
+            setattr(self, name, [])
+        self.stationary = []
+        self.__arrays = None
+
+        for owner, units in ((0, state["p1Units"]), (1, state["p2Units"])):
+            structure_rows = {}
+            for type_index, unit_types in enumerate(units):
+                unit_type = shorthands[type_index]
+                # This depends on RM and UP always being the last types to be processed
+                if unit_type == remove or unit_type == upgrade:
+                    for uinfo in unit_types:
+                        row = structure_rows.get((int(uinfo[0]), int(uinfo[1])))
+                        if row is None:
+                            continue
+                        if unit_type == remove:
+                            self.pending_removal[row] = True
+                        else:
+                            self.upgraded[row] = True
+                    continue
+                stationary = self.__stationary_types[type_index]
+                for uinfo in unit_types:
+                    x, y = int(uinfo[0]), int(uinfo[1])
+                    if stationary:
+                        structure_rows.setdefault((x, y), len(self.x))
+                    self.x.append(x)
+                    self.y.append(y)
+                    self.owner.append(owner)
+                    self.type_index.append(type_index)
+                    self.health.append(float(uinfo[2]) or self.__start_health[type_index])
+                    self.upgraded.append(False)
+                    self.pending_removal.append(False)
+                    self.unit_id.append(uinfo[3] if len(uinfo) > 3 else None)
+                    self.stationary.append(stationary)
+
+    def __len__(self):
+        return len(self.x)
+
+    def get_arrays(self):
+        """Gets the columns as NumPy arrays, converted once per table. Requires NumPy
+
+        Returns:
+            A dict from column name to a NumPy array, with the same names as the list attributes
+
+        """
+        if self.__arrays is None:
+            self.__arrays = {
+                "x": np.array(self.x, dtype=np.int64),
+                "y": np.array(self.y, dtype=np.int64),
+                "owner": np.array(self.owner, dtype=np.int64),
+                "type_index": np.array(self.type_index, dtype=np.int64),
+                "health": np.array(self.health, dtype=np.float64),
+                "upgraded": np.array(self.upgraded, dtype=bool),
+                "pending_removal": np.array(self.pending_removal, dtype=bool),
+                "unit_id": np.array(self.unit_id, dtype=object),
+                "stationary": np.array(self.stationary, dtype=bool),
+            }
+        return self.__arrays
+
+    def __use_numpy(self):
+        return HAVE_NUMPY and len(self.x) >= self.min_numpy_units
+
+    def get_structure_health_by_row(self, player_index):
+        """Sums the health of a player's structures on each row of the board
+
+        Args:
+            player_index: The player whose structures are summed, 0 for you 1 for the enemy
+
+        Returns:
+            A list with the total structure health on each y, from 0 to 27
+
+        """
+        if self.__use_numpy():
+            arrays = self.get_arrays()
+            mask = arrays["stationary"] & (arrays["owner"] == player_index)
+            return np.bincount(arrays["y"][mask], weights=arrays["health"][mask], minlength=28)[:28].tolist()
+        totals = [0.0] * 28
+        for row in range(len(self.x)):
+            if self.stationary[row] and self.owner[row] == player_index:
+                totals[self.y[row]] += self.health[row]
+        return totals
+
+    def get_units_in_range(self, location, radius, player_index=None, mobile_only=False):
+        """Finds the units in a circular area, using the same rule as GameMap.get_locations_in_range
+
+        Args:
+            location: The center of the area, [x, y]. Does not need to be an integer location
+            radius: The radius of the area
+            player_index: If not None, only units owned by this player are returned
+            mobile_only: If True, only mobile units are returned
+
+        Returns:
+            The rows of the units in the area, in increasing order
+
+        """
+        center_x, center_y = location
+        limit = radius + self.__get_hit_radius
+        if self.__use_numpy():
+            arrays = self.get_arrays()
+            mask = np.sqrt((arrays["x"] - center_x) ** 2 + (arrays["y"] - center_y) ** 2) < limit
+            if player_index is not None:
+                mask &= arrays["owner"] == player_index
+            if mobile_only:
+                mask &= ~arrays["stationary"]
+            return np.flatnonzero(mask).tolist()
+        rows = []
+        for row in range(len(self.x)):
+            if player_index is not None and self.owner[row] != player_index:
+                continue
+            if mobile_only and self.stationary[row]:
+                continue
+            if math.sqrt((self.x[row] - center_x) ** 2 + (self.y[row] - center_y) ** 2) < limit:
+                rows.append(row)
+        return rows
@@ -1,9 +1,64 @@
 import sys
+import json
+
+try:
+    import orjson
+    _loads = orjson.loads
+    JSON_BACKEND = "orjson"
+except ImportError:
+    try:
+        import ujson
+        _loads = ujson.loads
+        JSON_BACKEND = "ujson"
+    except ImportError:
+        _loads = json.loads
+        JSON_BACKEND = "json"
 
 
 BANNER_TEXT = "---------------- Starting Your Algo --------------------"
 
 
+class GameMessage(str):
+    """A message from the game engine, parsed once as it is read.
+    Behaves exactly like the raw string, so code that parses it again still works.
+
+    Attributes :
+        * parsed (dict): The message parsed as json
+
+    """
+    def __new__(cls, message, parsed):
+        game_message = super().__new__(cls, message)
+        game_message.parsed = parsed
+        return game_message
+
+    def __getnewargs__(self):
+        # Lets copy, deepcopy and pickle create the GameMessage again, along with its parsed json
+        return str(self), self.parsed
+
+
+def load_json(json_string):
+    """Parses a json string with the fastest json library installed, orjson or ujson if available and json otherwise
+
+    """
+    return _loads(json_string)
+
+def parse_message(message):
+    """Gets the parsed json of a message from the game engine without parsing it again if it has already been parsed
+
+    Args:
+        message: A GameMessage, a json string or an already parsed dict
+
+    Returns:
+        The parsed message
+
+    """
+    if isinstance(message, GameMessage):
+        return message.parsed
+    if isinstance(message, dict):
+        return message
+    return load_json(message)
+
+
 def get_command():
     """Gets input from stdin
 
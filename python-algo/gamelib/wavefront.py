@@ -0,0 +1,119 @@
+"""
+Vectorised breadth first search over many blocked layouts at once, used by ShortestPathFinder
+when NumPy is installed. Every array has a leading batch axis with one entry per layout, and
+grids are indexed [x, y] so that ravelling a grid gives the flat index x * ARENA_SIZE + y used
+by BOUNDS_MASK and the GameMap bitboards.
+
+NumPy is optional. HAVE_NUMPY is False when it is not installed, and the path finder falls back
+to its pure Python search.
+"""
+from .game_map import ARENA_SIZE, BOUNDS_MASK
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+HAVE_NUMPY = np is not None
+
+_FLAT_SIZE = ARENA_SIZE * ARENA_SIZE
+_BYTE_SIZE = (_FLAT_SIZE + 7) // 8
+
+if HAVE_NUMPY:
+    BOUNDS_GRID = np.array(BOUNDS_MASK, dtype=bool).reshape(ARENA_SIZE, ARENA_SIZE)
+    _ROW_MASK = np.uint32((1 << ARENA_SIZE) - 1)
+
+
+def bits_to_grids(bits_list):
+    """Unpacks bitboards into a stack of boolean grids
+
+    Args:
+        bits_list: A list of bitboards, bit x * ARENA_SIZE + y set for each location
+
+    Returns:
+        A bool array of shape (len(bits_list), ARENA_SIZE, ARENA_SIZE)
+
+    """
+    packed = np.frombuffer(b"".join(bits.to_bytes(_BYTE_SIZE, "little") for bits in bits_list), dtype=np.uint8)
+    unpacked = np.unpackbits(packed.reshape(len(bits_list), _BYTE_SIZE), axis=1, bitorder="little")
+    return unpacked[:, :_FLAT_SIZE].reshape(len(bits_list), ARENA_SIZE, ARENA_SIZE).astype(bool)
+
+
+def pack_rows(grids):
+    """Packs a stack of boolean grids into one uint32 per x, with bit y set where grid[x, y] is True
+    """
+    return np.packbits(grids, axis=-1, bitorder="little").view("<u4")[..., 0]
+
+
+def unpack_rows(rows):
+    """Unpacks rows from pack_rows back into a stack of boolean grids
+    """
+    unpacked = np.unpackbits(rows.astype("<u4").view(np.uint8).reshape(rows.shape + (4,)), axis=-1, bitorder="little")
+    return unpacked[..., :ARENA_SIZE].astype(bool)
+
+
+def _expand(open_rows, reached, planes=None):
+    """Grows reached through open locations one step at a time until it stops changing. If planes is a list,
+    the number of steps each location stayed unreached is counted into it as bit planes, least significant first.
+    """
+    frontier = reached & open_rows
+    one = np.uint32(1)
+    while frontier.any():
+        if planes is not None:
+            carry = ~reached & _ROW_MASK
+            for index, plane in enumerate(planes):
+                planes[index], carry = plane ^ carry, plane & carry
+                if not carry.any():
+                    break
+            else:
+                if carry.any():
+                    planes.append(carry)
+        grown = (frontier << one) | (frontier >> one)
+        grown[:, 1:] |= frontier[:, :-1]
+        grown[:, :-1] |= frontier[:, 1:]
+        grown &= open_rows
+        grown &= ~reached
+        reached |= grown
+        frontier = grown
+    return reached
+
+
+def reached_grids(blocked, sources):
+    """Finds the locations reachable from a set of sources for a batch of layouts. Blocked sources are reached,
+    but are not searched from.
+
+    Args:
+        blocked: A bool array of shape (batch, ARENA_SIZE, ARENA_SIZE), True where a location is blocked
+        sources: A bool array of the same shape, True at each source
+
+    Returns:
+        A bool array of the same shape, True where a location was reached
+
+    """
+    return unpack_rows(_expand(pack_rows(BOUNDS_GRID & ~blocked), pack_rows(sources)))
+
+
+def distance_fields(blocked, sources):
+    """Computes the pathlength of every location from a set of sources for a batch of layouts,
+    matching ShortestPathFinder._validate. Sources have a pathlength of 0 even when blocked,
+    but blocked sources are not searched from.
+
+    Each row of the grid is packed into the bits of one uint32, so a step of the search is a handful of
+    shifts and ors over ARENA_SIZE words per layout. Distances are kept as bit planes of a counter and
+    only unpacked at the end.
+
+    Args:
+        blocked: A bool array of shape (batch, ARENA_SIZE, ARENA_SIZE), True where a location is blocked
+        sources: A bool array of the same shape, True at each source
+
+    Returns:
+        An int16 array of the same shape with the pathlength of each location, -1 where it was not reached
+
+    """
+    planes = []
+    reached = _expand(pack_rows(BOUNDS_GRID & ~blocked), pack_rows(sources), planes)
+    pathlength = np.zeros(blocked.shape, dtype=np.int16)
+    for index, plane in enumerate(planes):
+        pathlength += unpack_rows(plane).astype(np.int16) << index
+    pathlength[~unpack_rows(reached)] = -1
+    return pathlength